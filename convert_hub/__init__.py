@@ -0,0 +1,9 @@
+from convert_hub.engine import (LANGUAGES, DEFAULT_OPTIONS, CHUNK_TOKENS, RULES, get_extension,
+                                get_rules, conversion_header, convert_chunk, convert_source,
+                                iter_conversion, iter_rewrite)
+from convert_hub.lexer import Token, TokenArray, tokenize
+from convert_hub.batch import (SOURCE_EXTENSIONS, WORKER_COUNTS, BatchResult,
+                               get_worker_count, get_output_file, find_source_files,
+                               convert_file, run_batch)
+from convert_hub.verify import VerifyReport, verify_outputs
+from convert_hub.watch import WatchSession
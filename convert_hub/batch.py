@@ -0,0 +1,446 @@
+import asyncio
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+from convert_hub.cache import DEFAULT_CACHE_SIZE, get_cache, file_key, map_key, source_key
+from convert_hub.detect import AUTO_DETECT, detect_file
+from convert_hub.engine import HEADER_LANGUAGES, get_extension
+from convert_hub.fileio import (IO_CONCURRENCY, PREFETCH_DEPTH, PREFETCH_FILE_SIZE,
+                                AsyncFileIO, atomic_output)
+from convert_hub.includes import IncludeGraph
+from convert_hub.memory import BYTES_PER_SOURCE_CHAR, MemoryBudget, reset_peak_rss, peak_rss
+from convert_hub.profiling import StageTimer, TraceLog, profile_to
+from convert_hub.sourcemap import SOURCE_MAP_SUFFIX, LineMap, write_source_map
+from convert_hub.streaming import convert_stream
+from convert_hub.symbols import SymbolIndex, get_index_path, methods_digest, wants_methods
+from convert_hub.verify import verify_outputs
+
+# File extensions picked up by batch conversion for each source language
+SOURCE_EXTENSIONS = {
+    "C": (".c", ".h"),
+    "C++": (".cpp", ".cc", ".cxx", ".hpp", ".hh", ".h"),
+    "C#": (".cs",),
+}
+
+HEADER_EXTENSIONS = (".h", ".hpp", ".hh")
+
+# Worker processes for each "Threading" choice (None = one per CPU)
+WORKER_COUNTS = {
+    "Single Thread": 1,
+    "Multi-Thread (2 cores)": 2,
+    "Multi-Thread (4 cores)": 4,
+    "Max Performance": None,
+}
+
+
+class BatchResult:
+    def __init__(self):
+        self.converted = 0
+        self.cached = 0
+        self.workers = 1
+        self.peak_rss = None
+        self.failed = 0
+        self.lines = 0
+        self.elapsed = 0.0
+        self.errors = []
+        self.cancelled = False
+        self.indexed = 0
+        self.methods = 0
+        self.prefetched = 0
+        # Outputs deleted along with their source by a watch
+        self.removed = 0
+        # {language: files} of the files routed by detection in AUTO_DETECT runs
+        self.languages = {}
+        # VerifyReport of the outputs when the run verifies them
+        self.verification = None
+        self.timer = StageTimer()
+    
+    @property
+    def lines_per_second(self):
+        return self.lines / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class FileResult:
+    # What a worker reports back for one file; kept plain so it pickles cheaply. output
+    # and mappings are the converted text and its source map when the parent writes
+    # them, else None.
+    def __init__(self, lines, cached, peak_rss, stages, output=None, mappings=None):
+        self.lines = lines
+        self.cached = cached
+        self.peak_rss = peak_rss
+        self.stages = stages
+        self.output = output
+        self.mappings = mappings
+
+
+def get_worker_count(choice):
+    count = WORKER_COUNTS.get(choice, 1)
+    return count or os.cpu_count() or 1
+
+
+def get_output_file(source_path, source_root, output_root, to_lang):
+    relative = os.path.relpath(source_path, source_root)
+    base, ext = os.path.splitext(relative)
+    
+    # Headers stay headers when the target language has them, else they keep their
+    # extension in the name so foo.h and foo.c do not both become foo.cs
+    if ext.lower() in HEADER_EXTENSIONS and to_lang in HEADER_LANGUAGES:
+        target_ext = ".h" if to_lang == "C" else ".hpp"
+    elif ext.lower() in HEADER_EXTENSIONS:
+        target_ext = ext + get_extension(to_lang)
+    else:
+        target_ext = get_extension(to_lang)
+    
+    return os.path.join(output_root, base + target_ext)
+
+
+def find_output_clashes(jobs):
+    # {source path: error} for the sources of (source path, output file) jobs whose output
+    # an earlier job already writes, such as foo.h and foo.hpp both giving foo.hpp
+    owners = {}
+    clashes = {}
+    for source_path, output_file in jobs:
+        key = os.path.normcase(os.path.abspath(output_file))
+        if key in owners:
+            clashes[source_path] = ValueError(
+                f"{output_file} is also the output of {owners[key]}")
+        else:
+            owners[key] = source_path
+    return clashes
+
+
+def get_include_renames(graph, path, output_files, to_lang):
+    # The renames for path's includes of files of the tree, or None. Languages without
+    # headers do not include converted files, so their includes are never renamed.
+    if to_lang not in HEADER_LANGUAGES:
+        return None
+    return graph.renames(path, output_files) or None
+
+
+def get_source_extensions(from_lang):
+    if from_lang == AUTO_DETECT:
+        return tuple({ext for exts in SOURCE_EXTENSIONS.values() for ext in exts})
+    return SOURCE_EXTENSIONS.get(from_lang, ())
+
+
+def get_job(source_path, output_file, language, from_lang, to_lang, options, methods,
+            context, includes):
+    # The arguments convert_file needs for one file beyond the run's own: a file gets the
+    # method map only when its pair groups functions into structs, and its cache context
+    # covers whatever of the map and its include renames its output depends on
+    file_methods = methods if wants_methods(language, to_lang, options) else None
+    file_context = context if file_methods else None
+    return (source_path, output_file, language or from_lang, file_methods, includes,
+            [file_context, includes] if includes else file_context)
+
+
+def find_source_files(source_root, output_root, from_lang):
+    extensions = get_source_extensions(from_lang)
+    output_real = os.path.realpath(output_root)
+    
+    for dirpath, dirnames, filenames in os.walk(source_root):
+        # Never descend into the output tree when it lives inside the source tree
+        dirnames[:] = sorted(d for d in dirnames
+                             if os.path.realpath(os.path.join(dirpath, d)) != output_real)
+        for filename in sorted(filenames):
+            if os.path.splitext(filename)[1].lower() in extensions:
+                yield os.path.join(dirpath, filename)
+
+
+def convert_file(source_path, output_file, from_lang, to_lang, options, cache_dir=None,
+                 cache_size=DEFAULT_CACHE_SIZE, memory_limit=None, profile_file=None,
+                 methods=None, context=None, includes=None, source=None, source_map=False):
+    # Runs inside worker processes, so it must stay a picklable module-level function.
+    # Files are streamed so a worker's memory does not grow with the size of the file.
+    # methods is the project's method map for convert_oo, includes the #include renames
+    # for this file and context whatever else besides options the output depends on.
+    # source is the text of a file the parent prefetched; its output is then returned in
+    # the FileResult for the parent to write instead of being written here. source_map
+    # writes a source map next to the output.
+    if source is not None:
+        return convert_text(source, from_lang, to_lang, options, cache_dir, cache_size,
+                            memory_limit, profile_file, methods, context, includes,
+                            source_map)
+    reset_peak_rss()
+    timer = StageTimer()
+    map_path = output_file + SOURCE_MAP_SUFFIX
+    
+    with profile_to(profile_file):
+        os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+        
+        cache = get_cache(cache_dir, cache_size) if cache_dir else None
+        if cache:
+            with timer.stage("cache"):
+                key, lines = file_key(source_path, from_lang, to_lang, options, context)
+                mappings = cache.get(map_key(key)) if source_map else None
+                hit = (mappings is not None or not source_map) and \
+                    cache.get_file(key, output_file)
+                if hit and source_map:
+                    write_source_map(map_path, source_path, output_file, mappings)
+            if hit:
+                return FileResult(lines, True, peak_rss(), timer.stages)
+        
+        budget = MemoryBudget(memory_limit) if memory_limit else None
+        line_map = LineMap() if source_map else None
+        with open(source_path, 'r', encoding='utf-8') as input_file, \
+                atomic_output(output_file) as output:
+            lines = convert_stream(input_file, output, from_lang, to_lang, options,
+                                   budget=budget, timer=timer, methods=methods,
+                                   includes=includes, line_map=line_map)
+        if line_map is not None:
+            mappings = line_map.mappings()
+            write_source_map(map_path, source_path, output_file, mappings)
+        
+        if cache:
+            with timer.stage("cache"):
+                cache.put_file(key, output_file)
+                if line_map is not None:
+                    cache.put(map_key(key), mappings)
+    
+    return FileResult(lines, False, peak_rss(), timer.stages)
+
+
+def convert_text(source, from_lang, to_lang, options, cache_dir, cache_size, memory_limit,
+                 profile_file, methods, context, includes, source_map=False):
+    # convert_file for prefetched text. Runs the same streaming pipeline over the text
+    # so the output is identical to converting the file from disk.
+    reset_peak_rss()
+    timer = StageTimer()
+    
+    with profile_to(profile_file):
+        cache = get_cache(cache_dir, cache_size) if cache_dir else None
+        if cache:
+            with timer.stage("cache"):
+                key = source_key(source, from_lang, to_lang, options, context)
+                mappings = cache.get(map_key(key)) if source_map else None
+                cached = None
+                if mappings is not None or not source_map:
+                    cached = cache.get(key)
+            if cached is not None:
+                return FileResult(source.count("\n") + 1, True, peak_rss(), timer.stages,
+                                  cached, mappings)
+        
+        budget = MemoryBudget(memory_limit) if memory_limit else None
+        line_map = LineMap() if source_map else None
+        output = io.StringIO()
+        lines = convert_stream(io.StringIO(source), output, from_lang, to_lang, options,
+                               budget=budget, timer=timer, methods=methods,
+                               includes=includes, line_map=line_map)
+        text = output.getvalue()
+        mappings = line_map.mappings() if line_map is not None else None
+        
+        if cache:
+            with timer.stage("cache"):
+                cache.store(key, lambda file: file.write(text.encode("utf-8")))
+                if mappings is not None:
+                    cache.put(map_key(key), mappings)
+    
+    return FileResult(lines, False, peak_rss(), timer.stages, text, mappings)
+
+
+def get_profile_file(profile_dir, source_path, source_root):
+    if not profile_dir:
+        return None
+    return os.path.join(profile_dir, os.path.relpath(source_path, source_root) + ".prof")
+
+
+def run_batch(source_root, output_root, from_lang, to_lang, options, workers=1,
+              on_file_done=None, cancel_event=None, cache_dir=None,
+              cache_size=DEFAULT_CACHE_SIZE, memory_limit=None, trace_path=None,
+              profile_dir=None, io_concurrency=IO_CONCURRENCY, source_maps=False,
+              verify=False):
+    # on_file_done(source_path, done, total, error) is called from the calling thread.
+    # memory_limit caps the combined memory of all workers: the worker count is reduced
+    # until each one still gets a useful share, which then sizes its streaming window.
+    # trace_path gets a JSON-lines event per file; profile_dir a cProfile dump per file.
+    # With from_lang AUTO_DETECT every source file is converted from the language its
+    # contents look like. Files are read ahead and outputs written by up to
+    # io_concurrency threads while the workers convert. source_maps writes a source map
+    # next to every output. verify compile-checks every output once all are written.
+    result = BatchResult()
+    start_time = time.perf_counter()
+    with result.timer.stage("scan"):
+        jobs = [(path, get_output_file(path, source_root, output_root, to_lang))
+                for path in find_source_files(source_root, output_root, from_lang)]
+        # Files whose output another file already claims fail instead of overwriting it
+        clashes = find_output_clashes(jobs)
+        jobs = [job for job in jobs if job[0] not in clashes]
+    total = len(jobs) + len(clashes)
+    
+    languages = {}
+    if from_lang == AUTO_DETECT:
+        with result.timer.stage("detect"):
+            for path, _ in jobs:
+                try:
+                    languages[path] = detect_file(path).language
+                except OSError:
+                    # Reported when the file fails to convert
+                    languages[path] = None
+                language = languages[path]
+                result.languages[language] = result.languages.get(language, 0) + 1
+    
+    worker_limit = None
+    if memory_limit:
+        budget = MemoryBudget(memory_limit)
+        workers = budget.worker_count(workers)
+        worker_limit = budget.split(workers).limit
+    result.workers = workers
+    
+    # Functions are grouped into structs declared anywhere in the tree, so the symbols of
+    # every file are needed before any file is converted
+    methods = None
+    indexed = [path for path, _ in jobs
+               if wants_methods(languages.get(path, from_lang), to_lang, options)]
+    if indexed:
+        with result.timer.stage("index"):
+            index = SymbolIndex(get_index_path(cache_dir, source_root) if cache_dir else None)
+            result.indexed = index.update(indexed, workers)
+            methods = index.methods()
+        result.methods = len(methods)
+    context = methods_digest(methods) if methods else None
+    
+    # Headers are converted before the files that include them, and includes of headers
+    # whose extension changes are renamed to match
+    with result.timer.stage("includes"):
+        graph = IncludeGraph([path for path, _ in jobs])
+        outputs = {os.path.abspath(path): output_file for path, output_file in jobs}
+        by_path = dict(zip(graph.paths, jobs))
+        jobs = []
+        for path in graph.order():
+            source_path, output_file = by_path[path]
+            jobs.append(get_job(source_path, output_file,
+                                languages.get(source_path, from_lang), from_lang, to_lang,
+                                options, methods, context,
+                                get_include_renames(graph, path, outputs, to_lang)))
+    
+    trace = TraceLog(trace_path) if trace_path else None
+    if trace:
+        trace.write("batch_start", source=source_root, output=output_root, files=total,
+                    workers=workers, memory_limit=memory_limit, options=options,
+                    io_concurrency=io_concurrency, source_maps=source_maps, verify=verify,
+                    languages=result.languages or None,
+                    **{"from": from_lang, "to": to_lang})
+    
+    outputs_done = []
+    
+    def record(source_path, done, outcome):
+        if isinstance(outcome, Exception):
+            result.failed += 1
+            result.errors.append((source_path, str(outcome)))
+            if trace:
+                trace.write("file_failed", file=source_path, error=str(outcome))
+        else:
+            result.converted += 1
+            outputs_done.append(outputs[os.path.abspath(source_path)])
+            result.cached += outcome.cached
+            result.lines += outcome.lines
+            result.timer.merge(outcome.stages)
+            if outcome.peak_rss is not None:
+                result.peak_rss = max(result.peak_rss or 0, outcome.peak_rss)
+            if trace:
+                trace.write("file_done", file=source_path, lines=outcome.lines,
+                            cached=outcome.cached, peak_rss=outcome.peak_rss,
+                            stages=outcome.stages,
+                            language=languages.get(source_path, from_lang))
+        if on_file_done:
+            on_file_done(source_path, done, total,
+                         outcome if isinstance(outcome, Exception) else None)
+    
+    def cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+    
+    # Small files are prefetched whole, as long as a worker's share of the budget fits them
+    prefetch_limit = PREFETCH_FILE_SIZE
+    if worker_limit:
+        prefetch_limit = min(prefetch_limit, worker_limit // BYTES_PER_SOURCE_CHAR)
+    
+    async def convert_all(executor, file_io):
+        # Reading the next files, converting and writing finished outputs all overlap, so
+        # wall time tends to the larger of I/O and CPU rather than their sum. At most
+        # PREFETCH_DEPTH jobs per worker are in flight, which bounds the text held.
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(workers * PREFETCH_DEPTH)
+        done = 0
+        for source_path, error in clashes.items():
+            done += 1
+            record(source_path, done, error)
+        
+        async def run_job(source_path, output_file, language, file_methods, includes,
+                          file_context):
+            nonlocal done
+            try:
+                source = await file_io.read(source_path, prefetch_limit)
+                outcome = await loop.run_in_executor(executor, partial(
+                    convert_file, source_path, output_file, language, to_lang, options,
+                    cache_dir, cache_size, worker_limit,
+                    get_profile_file(profile_dir, source_path, source_root),
+                    file_methods, file_context, includes, source, source_maps))
+                if outcome.output is not None:
+                    await file_io.write(output_file, outcome.output)
+                    if outcome.mappings is not None:
+                        await file_io.run("output", write_source_map,
+                                          output_file + SOURCE_MAP_SUFFIX, source_path,
+                                          output_file, outcome.mappings)
+                    outcome.output = outcome.mappings = None
+                    result.prefetched += 1
+            except Exception as e:
+                outcome = e
+            finally:
+                slots.release()
+            done += 1
+            record(source_path, done, outcome)
+        
+        tasks = []
+        for job in jobs:
+            await slots.acquire()
+            if cancelled():
+                break
+            tasks.append(asyncio.create_task(run_job(*job)))
+        
+        pending = set(tasks)
+        while pending and not cancelled():
+            _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        if cancelled():
+            result.cancelled = True
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+    
+    if workers == 1:
+        # No point paying process start-up and pickling costs for a single worker; a
+        # thread still lets its conversions overlap with the file I/O
+        executor = ThreadPoolExecutor(max_workers=1)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    with executor, AsyncFileIO(io_concurrency, result.timer) as file_io:
+        asyncio.run(convert_all(executor, file_io))
+    
+    # Outputs include each other, so they are checked only once all are written
+    if verify and not result.cancelled:
+        def on_checked(check):
+            if trace:
+                trace.write("file_verified", file=check.path, status=check.status,
+                            elapsed=check.elapsed, cached=check.cached,
+                            checker=check.checker, messages=check.messages or None)
+        
+        with result.timer.stage("verify"):
+            result.verification = verify_outputs(outputs_done, workers, cache_dir,
+                                                 cache_size, on_checked, cancel_event)
+        result.cancelled = result.verification.cancelled
+    
+    result.elapsed = time.perf_counter() - start_time
+    if trace:
+        verification = result.verification
+        trace.write("batch_end", converted=result.converted, cached=result.cached,
+                    indexed=result.indexed, methods=result.methods,
+                    prefetched=result.prefetched, failed=result.failed, lines=result.lines,
+                    elapsed=result.elapsed,
+                    lines_per_second=result.lines_per_second, peak_rss=result.peak_rss,
+                    cancelled=result.cancelled, stages=result.timer.stages,
+                    verify_passed=verification.passed if verification else None,
+                    verify_failed=verification.failed if verification else None)
+        trace.close()
+    return result
@@ -0,0 +1,231 @@
+import json
+import os
+import platform
+import re
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import permutations
+
+from convert_hub.batch import run_batch
+from convert_hub.engine import ENGINE_VERSION, LANGUAGES, DEFAULT_OPTIONS, convert_source
+from convert_hub.memory import reset_peak_rss, peak_rss, format_bytes
+from convert_hub.profiling import StageTimer, format_seconds
+from convert_hub.streaming import convert_file_streaming
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            "examples")
+
+# Example each corpus is generated from, and the names renamed per copy so the corpus
+# reads like many distinct declarations rather than one repeated verbatim
+CORPUS_SOURCES = {
+    "C": ("c_example.c", ("User", "deposit", "withdraw", "transfer", "main", "MAX_USERS")),
+    "C++": ("cpp_example.cpp", ("BankAccount", "main")),
+    "C#": ("cs_example.cs", ("BankingApp", "BankAccount", "Program")),
+}
+
+SIZES = {
+    "1k": 1000,
+    "100k": 100000,
+    "10M": 10000000,
+}
+
+DEFAULT_SIZES = ("1k", "100k")
+
+# The engine mode holds the corpus, its tokens and the output in memory at once, which
+# at BYTES_PER_SOURCE_CHAR takes several GB for 10M lines; larger corpora are measured
+# in the stream and batch modes only
+ENGINE_MAX_LINES = 1000000
+
+# Lines per generated file in the batch corpus
+BATCH_FILE_LINES = 1000
+
+
+def generate_corpus(language, lines):
+    # Yields text chunks adding up to at least the requested number of lines
+    filename, names = CORPUS_SOURCES[language]
+    with open(os.path.join(EXAMPLES_DIR, filename), 'r', encoding='utf-8') as file:
+        template = file.read().rstrip("\n") + "\n\n"
+    
+    pattern = re.compile(r"\b(%s)\b" % "|".join(names))
+    template_lines = template.count("\n")
+    for copy in range(-(-lines // template_lines)):
+        yield pattern.sub(lambda match: f"{match.group()}_{copy}", template)
+
+
+def write_corpus(language, lines, path):
+    with open(path, 'w', encoding='utf-8') as file:
+        for text in generate_corpus(language, lines):
+            file.write(text)
+
+
+def write_batch_corpus(language, lines, directory):
+    # Splits the corpus over files of about BATCH_FILE_LINES lines in a few subdirectories
+    extension = CORPUS_SOURCES[language][0].rsplit(".", 1)[1]
+    pending = []
+    pending_lines = 0
+    count = 0
+    
+    def flush():
+        nonlocal count, pending, pending_lines
+        subdirectory = os.path.join(directory, f"module_{count % 16:02d}")
+        os.makedirs(subdirectory, exist_ok=True)
+        with open(os.path.join(subdirectory, f"file_{count:05d}.{extension}"), 'w',
+                  encoding='utf-8') as file:
+            file.write("".join(pending))
+        count += 1
+        pending = []
+        pending_lines = 0
+    
+    for text in generate_corpus(language, lines):
+        pending.append(text)
+        pending_lines += text.count("\n")
+        if pending_lines >= BATCH_FILE_LINES:
+            flush()
+    if pending:
+        flush()
+    return count
+
+
+def measure_engine(path, from_lang, to_lang, options):
+    # In-memory conversion of the whole file
+    reset_peak_rss()
+    timer = StageTimer()
+    
+    with timer.stage("read"):
+        with open(path, 'r', encoding='utf-8') as file:
+            source = file.read()
+    result = convert_source(source, from_lang, to_lang, options, timer)
+    
+    return {
+        "seconds": timer.total,
+        "stages": timer.stages,
+        "output_bytes": len(result.encode("utf-8")),
+        "peak_rss": peak_rss(),
+    }
+
+
+def measure_stream(path, from_lang, to_lang, options):
+    reset_peak_rss()
+    timer = StageTimer()
+    output_fd, output_path = tempfile.mkstemp()
+    os.close(output_fd)
+    try:
+        start = time.perf_counter()
+        convert_file_streaming(path, output_path, from_lang, to_lang, options, timer=timer)
+        seconds = time.perf_counter() - start
+    finally:
+        os.remove(output_path)
+    return {"seconds": seconds, "stages": timer.stages, "peak_rss": peak_rss()}
+
+
+def measure_batch(directory, from_lang, to_lang, options, workers):
+    output_root = tempfile.mkdtemp()
+    try:
+        result = run_batch(directory, output_root, from_lang, to_lang, options, workers)
+    finally:
+        shutil.rmtree(output_root, ignore_errors=True)
+    # Batch stages are summed over workers, so they can add up to more than seconds
+    return {
+        "seconds": result.elapsed,
+        "stages": result.timer.stages,
+        "files": result.converted,
+        "failed": result.failed,
+        "workers": result.workers,
+        "peak_rss": result.peak_rss,
+    }
+
+
+def run_isolated(function, *args):
+    # A fresh process per measurement keeps peak memory and warm caches from leaking
+    # between runs
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        return executor.submit(function, *args).result()
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, pairs=None, modes=("engine", "stream", "batch"),
+                   workers=None, options=None, log=None):
+    options = options or DEFAULT_OPTIONS
+    pairs = pairs or list(permutations(LANGUAGES, 2))
+    workers = workers or os.cpu_count() or 1
+    work_dir = tempfile.mkdtemp(prefix="c-convert-hub-bench-")
+    results = []
+    
+    try:
+        for size in sizes:
+            lines = SIZES[size]
+            for language in sorted({from_lang for from_lang, _ in pairs}):
+                corpus_path = os.path.join(work_dir, f"corpus_{language}_{size}.txt")
+                batch_dir = os.path.join(work_dir, f"batch_{language}_{size}")
+                write_corpus(language, lines, corpus_path)
+                if "batch" in modes:
+                    write_batch_corpus(language, lines, batch_dir)
+                with open(corpus_path, 'r', encoding='utf-8') as file:
+                    actual_lines = sum(1 for _ in file)
+                
+                for from_lang, to_lang in pairs:
+                    if from_lang != language:
+                        continue
+                    for mode in modes:
+                        if mode == "engine" and lines > ENGINE_MAX_LINES:
+                            continue
+                        if mode == "engine":
+                            measurement = run_isolated(measure_engine, corpus_path,
+                                                       from_lang, to_lang, options)
+                        elif mode == "stream":
+                            measurement = run_isolated(measure_stream, corpus_path,
+                                                       from_lang, to_lang, options)
+                        else:
+                            measurement = measure_batch(batch_dir, from_lang, to_lang,
+                                                        options, workers)
+                        
+                        seconds = measurement["seconds"]
+                        entry = {
+                            "size": size,
+                            "lines": actual_lines,
+                            "from": from_lang,
+                            "to": to_lang,
+                            "mode": mode,
+                            "lines_per_second": actual_lines / seconds if seconds else None,
+                        }
+                        entry.update(measurement)
+                        results.append(entry)
+                        if log:
+                            log(entry)
+                
+                os.remove(corpus_path)
+                shutil.rmtree(batch_dir, ignore_errors=True)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    
+    return {
+        "engine_version": ENGINE_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "workers": workers,
+        "options": options,
+        "results": results,
+    }
+
+
+def format_entry(entry):
+    line = (f"{entry['size']:>5} {entry['from']:>3} -> {entry['to']:<3} {entry['mode']:<6} "
+            f"{entry['seconds']:8.3f}s {entry['lines_per_second'] or 0:>12,.0f} lines/s "
+            f"peak {format_bytes(entry['peak_rss'])}")
+    if entry.get("stages"):
+        line += "  [" + ", ".join(f"{name} {format_seconds(seconds)}"
+                                  for name, seconds in entry["stages"].items()) + "]"
+    return line
+
+
+def write_report(report, path=None):
+    if path:
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+            file.write("\n")
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
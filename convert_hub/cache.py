@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+from convert_hub.engine import ENGINE_VERSION
+from convert_hub.fileio import atomic_output
+from convert_hub.rules import set_rules_dir
+from convert_hub.sourcemap import SOURCE_MAP_SUFFIX
+
+DEFAULT_CACHE_SIZE = 512 << 20
+DEFAULT_MEMORY_SIZE = 64 << 20
+
+# Bytes hashed per read when keying files
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def default_cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "c-convert-hub")
+
+
+def new_hasher(from_lang, to_lang, options, context=None):
+    # Everything that changes the output goes into the key besides the source itself.
+    # context stands for anything else it depends on, e.g. the project's method digest.
+    hasher = hashlib.sha256()
+    settings = [ENGINE_VERSION, from_lang, to_lang, options]
+    if context:
+        settings.append(context)
+    settings = json.dumps(settings, sort_keys=True)
+    hasher.update(settings.encode("utf-8"))
+    hasher.update(b"\0")
+    return hasher
+
+
+def source_key(source, from_lang, to_lang, options, context=None):
+    hasher = new_hasher(from_lang, to_lang, options, context)
+    hasher.update(source.encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def file_key(path, from_lang, to_lang, options, context=None):
+    # Hashes the decoded text in chunks so a key matches source_key for the same content
+    # without holding the whole file in memory. Returns (key, source_lines).
+    hasher = new_hasher(from_lang, to_lang, options, context)
+    lines = 0
+    with open(path, 'r', encoding='utf-8') as file:
+        while True:
+            chunk = file.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk.encode("utf-8"))
+            lines += chunk.count("\n")
+    return hasher.hexdigest(), lines + 1
+
+
+def map_key(key):
+    # The source map mappings of an output are cached next to it
+    return key + SOURCE_MAP_SUFFIX
+
+
+class ConversionCache:
+    # Two tiers: a small LRU dict in front of a size-bounded directory of entries named by
+    # key. Disk recency is tracked through file mtimes so it survives restarts and is
+    # shared by every process using the same directory.
+    
+    def __init__(self, directory=None, max_bytes=DEFAULT_CACHE_SIZE,
+                 memory_bytes=DEFAULT_MEMORY_SIZE):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._disk_size = None
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+    
+    def entry_path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+    
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+        
+        path = self.entry_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8', newline='') as file:
+                text = file.read()
+            os.utime(path)
+        except OSError:
+            return None
+        
+        self.remember(key, text)
+        return text
+    
+    def get_file(self, key, output_path):
+        # Copies a cached entry straight to output_path; returns False on a miss
+        path = self.entry_path(key)
+        try:
+            with open(path, 'rb') as entry, atomic_output(output_path, 'wb') as output:
+                shutil.copyfileobj(entry, output)
+            os.utime(path)
+        except OSError:
+            return False
+        return True
+    
+    def put(self, key, text):
+        self.remember(key, text)
+        self.store(key, lambda file: file.write(text.encode("utf-8")))
+    
+    def put_file(self, key, path):
+        def copy(file):
+            with open(path, 'rb') as source:
+                shutil.copyfileobj(source, file)
+        self.store(key, copy)
+    
+    def remember(self, key, text):
+        size = len(text)
+        if size > self.memory_bytes:
+            return
+        
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return
+            self._memory[key] = text
+            self._memory_size += size
+            while self._memory_size > self.memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_size -= len(evicted)
+    
+    def store(self, key, write):
+        path = self.entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        
+        # Write then rename, so readers in other processes never see a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                write(file)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        
+        with self._lock:
+            if self._disk_size is None:
+                self._disk_size = self.scan_size()
+            else:
+                self._disk_size += os.path.getsize(path)
+            over_budget = self._disk_size > self.max_bytes
+        if over_budget:
+            self.trim()
+    
+    def iter_entries(self):
+        for bucket in os.scandir(self.directory):
+            # Entries live in two-character buckets; other directories (symbol indexes)
+            # are not part of the budget
+            if len(bucket.name) != 2 or not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                yield entry.path, stat.st_size, stat.st_mtime
+    
+    def scan_size(self):
+        return sum(size for _, size, _ in self.iter_entries())
+    
+    def trim(self):
+        # Evicts least recently used entries until the cache is back to 90% of its budget,
+        # so a full cache doesn't rescan the directory on every write
+        entries = sorted(self.iter_entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 9 // 10
+        
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        
+        with self._lock:
+            self._disk_size = total
+    
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_size = 0
+            self._disk_size = 0
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory, exist_ok=True)
+
+
+# One cache per directory and process, so batch workers scan the directory only once
+_caches = {}
+
+
+def get_cache(directory=None, max_bytes=DEFAULT_CACHE_SIZE):
+    directory = directory or default_cache_dir()
+    if directory not in _caches:
+        _caches[directory] = ConversionCache(directory, max_bytes)
+        # The compiled rule tables are cached alongside the outputs
+        set_rules_dir(directory)
+    return _caches[directory]
@@ -0,0 +1,352 @@
+import argparse
+import os
+import sys
+import time
+from contextlib import ExitStack
+
+from convert_hub.engine import LANGUAGES, DEFAULT_OPTIONS
+from convert_hub.streaming import convert_stream
+from convert_hub.batch import WORKER_COUNTS, find_source_files, get_worker_count, run_batch
+from convert_hub.cache import (DEFAULT_CACHE_SIZE, default_cache_dir, get_cache, file_key,
+                               map_key)
+from convert_hub.detect import AUTO_DETECT, detect_file
+from convert_hub.fileio import IO_CONCURRENCY, atomic_output
+from convert_hub.memory import MemoryBudget, peak_rss, format_bytes
+from convert_hub.profiling import StageTimer, profile_to
+from convert_hub.sourcemap import SOURCE_MAP_SUFFIX, LineMap, write_source_map
+from convert_hub.verify import FAILED
+from convert_hub.watch import WatchSession
+from convert_hub.symbols import (SymbolIndex, get_index_path, methods_digest, resolve_methods,
+                                 scan_file, wants_methods)
+from convert_hub.benchmark import (SIZES, DEFAULT_SIZES, run_benchmarks, format_entry,
+                                   write_report)
+
+COMMANDS = ("convert", "batch", "bench")
+
+
+def positive_int(value):
+    # argparse type for counts that must be at least 1
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def add_common_arguments(parser):
+    parser.add_argument("--from", dest="from_lang", choices=LANGUAGES + (AUTO_DETECT,),
+                        required=True,
+                        help=f"source language ({AUTO_DETECT}: detect it from the contents "
+                             "of each file)")
+    parser.add_argument("--to", dest="to_lang", choices=LANGUAGES, required=True,
+                        help="target language")
+    parser.add_argument("--no-comments", dest="preserve_comments", action="store_false",
+                        default=DEFAULT_OPTIONS["preserve_comments"],
+                        help="do not preserve comments")
+    parser.add_argument("--no-oop", dest="convert_oo", action="store_false",
+                        default=DEFAULT_OPTIONS["convert_oo"],
+                        help="do not convert OOP constructs")
+    parser.add_argument("--optimize", dest="optimize_code", action="store_true",
+                        default=DEFAULT_OPTIONS["optimize_code"],
+                        help="optimize converted code")
+    parser.add_argument("--no-metadata", dest="include_metadata", action="store_false",
+                        default=DEFAULT_OPTIONS["include_metadata"],
+                        help="omit conversion metadata")
+    parser.add_argument("--cache-dir", default=default_cache_dir(),
+                        help="conversion cache directory (default: %(default)s)")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE >> 20,
+                        help="conversion cache size in MB (default: %(default)s)")
+    parser.add_argument("--no-cache", dest="cache_dir", action="store_const", const=None,
+                        help="do not read or write the conversion cache")
+    parser.add_argument("--memory-limit", type=int, metavar="MB",
+                        help="keep conversion memory under this many MB")
+    parser.add_argument("--source-map", action="store_true",
+                        help=f"write a source map (OUTPUT{SOURCE_MAP_SUFFIX}) next to every "
+                             "output file")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="main.py",
+                                     description="C-Convert-Hub headless converter")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    convert_parser = subparsers.add_parser("convert", help="convert a single file")
+    add_common_arguments(convert_parser)
+    convert_parser.add_argument("input", help="source file ('-' for stdin)")
+    convert_parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    convert_parser.add_argument("--timings", action="store_true",
+                                help="print a per-stage timing breakdown")
+    convert_parser.add_argument("--profile", metavar="FILE",
+                                help="write cProfile stats for the conversion to FILE")
+    convert_parser.add_argument("--project", metavar="DIR",
+                                help="group functions into structs declared anywhere under "
+                                     "DIR (default: only those in the input file)")
+    
+    batch_parser = subparsers.add_parser("batch", help="convert a source tree")
+    add_common_arguments(batch_parser)
+    batch_parser.add_argument("input", help="source directory")
+    batch_parser.add_argument("-o", "--output", required=True, help="output directory")
+    batch_parser.add_argument("-j", "--jobs", type=positive_int,
+                              help="worker processes (default: one per CPU)")
+    batch_parser.add_argument("--threading", choices=list(WORKER_COUNTS),
+                              help="use the same worker presets as the GUI")
+    batch_parser.add_argument("-q", "--quiet", action="store_true",
+                              help="only print the summary")
+    batch_parser.add_argument("--trace", metavar="FILE",
+                              help="write a JSON-lines event log of the run to FILE")
+    batch_parser.add_argument("--profile-dir", metavar="DIR",
+                              help="write cProfile stats for every file under DIR")
+    batch_parser.add_argument("--io-concurrency", type=positive_int, default=IO_CONCURRENCY,
+                              metavar="N",
+                              help="files read and written at once (default: %(default)s)")
+    batch_parser.add_argument("--verify", action="store_true",
+                              help="compile-check every output with the installed compilers "
+                                   "and fail the run if any does not compile")
+    batch_parser.add_argument("--verify-report", metavar="FILE",
+                              help="write a JSON pass/fail report of --verify (implies it)")
+    batch_parser.add_argument("--watch", action="store_true",
+                              help="after the run, keep reconverting files as they change "
+                                   "until interrupted")
+    
+    bench_parser = subparsers.add_parser("bench", help="benchmark generated corpora")
+    bench_parser.add_argument("--sizes", default=",".join(DEFAULT_SIZES),
+                              help=f"comma-separated corpus sizes out of {', '.join(SIZES)} "
+                                   "(default: %(default)s)")
+    bench_parser.add_argument("--pairs",
+                              help="comma-separated FROM:TO pairs (default: every pair)")
+    bench_parser.add_argument("--modes", default="engine,stream,batch",
+                              help="comma-separated modes (default: %(default)s)")
+    bench_parser.add_argument("-j", "--jobs", type=positive_int,
+                              help="batch worker processes (default: one per CPU)")
+    bench_parser.add_argument("-o", "--output", help="JSON report file (default: stdout)")
+    return parser
+
+
+def get_options(args):
+    return {name: getattr(args, name) for name in DEFAULT_OPTIONS}
+
+
+def run_convert(args):
+    if args.source_map and not args.output:
+        print("Error: --source-map needs an output file (-o)", file=sys.stderr)
+        return 2
+    if args.from_lang == AUTO_DETECT:
+        if args.input == "-":
+            print(f"Error: --from {AUTO_DETECT} needs an input file", file=sys.stderr)
+            return 2
+        detection = detect_file(args.input)
+        if detection.language is None:
+            print(f"Error: cannot detect the language of {args.input}", file=sys.stderr)
+            return 2
+        args.from_lang = detection.language
+        print(f"Detected {detection.language} ({detection.confidence:.0%} confidence)",
+              file=sys.stderr)
+    
+    options = get_options(args)
+    timer = StageTimer()
+    
+    with profile_to(args.profile):
+        convert_input(args, options, timer)
+    
+    if args.timings:
+        print(f"Timings: {timer.summary()}", file=sys.stderr)
+    if args.memory_limit:
+        print(f"Peak RSS: {format_bytes(peak_rss())}", file=sys.stderr)
+    return 0
+
+
+def find_methods(args):
+    # The project's method map with --project, otherwise one from the input's own symbols
+    # (none for stdin, which can only be read once)
+    if args.project:
+        paths = list(find_source_files(args.project, args.project, args.from_lang))
+        if args.input != "-" and os.path.abspath(args.input) not in map(os.path.abspath, paths):
+            paths.append(args.input)
+        index = SymbolIndex(get_index_path(args.cache_dir, args.project)
+                            if args.cache_dir else None)
+        index.update(paths, os.cpu_count() or 1)
+        return index.methods()
+    if args.input == "-":
+        return None
+    return resolve_methods([scan_file(args.input)])
+
+
+def convert_input(args, options, timer):
+    methods = None
+    if wants_methods(args.from_lang, args.to_lang, options):
+        with timer.stage("index"):
+            methods = find_methods(args)
+    context = methods_digest(methods) if methods else None
+    
+    # Only file-to-file conversions go through the cache
+    cache = None
+    map_path = f"{args.output}{SOURCE_MAP_SUFFIX}"
+    if args.cache_dir and args.input != "-" and args.output:
+        cache = get_cache(args.cache_dir, args.cache_size << 20)
+        with timer.stage("cache"):
+            key, _ = file_key(args.input, args.from_lang, args.to_lang, options, context)
+            mappings = cache.get(map_key(key)) if args.source_map else None
+            if (mappings is not None or not args.source_map) and \
+                    cache.get_file(key, args.output):
+                if args.source_map:
+                    write_source_map(map_path, args.input, args.output, mappings)
+                return
+    
+    # Always streamed, so memory stays flat however large the input is
+    with ExitStack() as stack:
+        if args.input == "-":
+            input_file = sys.stdin
+        else:
+            input_file = stack.enter_context(open(args.input, 'r', encoding='utf-8'))
+        
+        if args.output:
+            output_file = stack.enter_context(atomic_output(args.output))
+        else:
+            output_file = sys.stdout
+        
+        budget = MemoryBudget(args.memory_limit << 20) if args.memory_limit else None
+        line_map = LineMap() if args.source_map else None
+        convert_stream(input_file, output_file, args.from_lang, args.to_lang, options,
+                       budget=budget, timer=timer, methods=methods, line_map=line_map)
+    if line_map is not None:
+        mappings = line_map.mappings()
+        write_source_map(map_path, args.input, args.output, mappings)
+    
+    if cache:
+        with timer.stage("cache"):
+            cache.put_file(key, args.output)
+            if line_map is not None:
+                cache.put(map_key(key), mappings)
+
+
+def run_batch_command(args):
+    if not os.path.isdir(args.input):
+        print(f"Error: {args.input} is not a directory", file=sys.stderr)
+        return 2
+    
+    if args.jobs:
+        workers = args.jobs
+    else:
+        workers = get_worker_count(args.threading or "Max Performance")
+    
+    def on_file_done(source_path, done, total, error):
+        if error is not None:
+            print(f"[{done}/{total}] FAILED {source_path}: {error}", file=sys.stderr)
+        elif not args.quiet:
+            print(f"[{done}/{total}] {source_path}", file=sys.stderr)
+    
+    memory_limit = args.memory_limit << 20 if args.memory_limit else None
+    session = None
+    if args.watch:
+        # Watching from before the run, so files saved during it are picked up as well
+        session = WatchSession(args.input, args.output, args.from_lang, args.to_lang,
+                               get_options(args), workers, args.cache_dir,
+                               args.cache_size << 20, memory_limit, args.source_map)
+    
+    with session or ExitStack():
+        result = run_batch(args.input, args.output, args.from_lang, args.to_lang,
+                           get_options(args), workers, on_file_done,
+                           cache_dir=args.cache_dir, cache_size=args.cache_size << 20,
+                           memory_limit=memory_limit, trace_path=args.trace,
+                           profile_dir=args.profile_dir,
+                           io_concurrency=max(1, args.io_concurrency),
+                           source_maps=args.source_map,
+                           verify=args.verify or bool(args.verify_report))
+        print_batch_summary(result)
+        if result.verification:
+            print_verification(result.verification, args)
+        if session:
+            run_watch(session, args)
+    if result.verification and result.verification.failed:
+        return 1
+    return 1 if result.failed else 0
+
+
+def print_batch_summary(result):
+    print(f"Batch complete: {result.converted} file(s) ({result.cached} cached), "
+          f"{result.lines} lines in {result.elapsed:.2f}s "
+          f"({result.lines_per_second:,.0f} lines/s), {result.failed} failed, "
+          f"{result.workers} worker(s), peak RSS {format_bytes(result.peak_rss)} per worker",
+          file=sys.stderr)
+    if result.languages:
+        detected = ", ".join(f"{count} {language or 'unreadable'}"
+                             for language, count in sorted(result.languages.items(),
+                                                           key=lambda item: -item[1]))
+        print(f"Detected languages: {detected}", file=sys.stderr)
+    if result.indexed or result.methods:
+        print(f"Symbol index: {result.indexed} file(s) rescanned, "
+              f"{result.methods} function(s) grouped into structs", file=sys.stderr)
+    print(f"Timings (summed over workers): {result.timer.summary()}", file=sys.stderr)
+
+
+def print_verification(report, args):
+    for check in report.files:
+        if check.status == FAILED:
+            print(f"VERIFY FAILED {check.path} ({check.checker}, {check.elapsed:.2f}s)",
+                  file=sys.stderr)
+            if not args.quiet:
+                for line in check.messages.splitlines():
+                    print(f"    {line}", file=sys.stderr)
+    missing = [language for language, checker in sorted(report.checkers.items())
+               if checker is None]
+    if missing:
+        print(f"No compiler found for {', '.join(missing)}; those files were skipped",
+              file=sys.stderr)
+    print(f"Verification: {report.summary()}", file=sys.stderr)
+    if args.verify_report:
+        report.write(args.verify_report)
+
+
+def run_watch(session, args):
+    # Runs until Ctrl+C, one line per burst of changes plus one per failed file
+    def on_update(result):
+        for source_path, error in result.errors:
+            print(f"FAILED {source_path}: {error}", file=sys.stderr)
+        print(f"{time.strftime('%H:%M:%S')} reconverted {result.converted} file(s) "
+              f"({result.cached} cached), removed {result.removed}, {result.failed} failed "
+              f"in {result.elapsed * 1000:.0f} ms", file=sys.stderr)
+        if not args.quiet:
+            print(f"  Timings: {result.timer.summary()}", file=sys.stderr)
+    
+    print(f"Watching {args.input} for changes (Ctrl+C to stop)", file=sys.stderr)
+    try:
+        session.run(on_update)
+    except KeyboardInterrupt:
+        print("Stopped watching", file=sys.stderr)
+
+
+def run_bench_command(args, parser):
+    sizes = args.sizes.split(",")
+    modes = args.modes.split(",")
+    pairs = None
+    if args.pairs:
+        pairs = [tuple(pair.split(":", 1)) for pair in args.pairs.split(",")]
+    
+    for size in sizes:
+        if size not in SIZES:
+            parser.error(f"unknown size {size!r}")
+    for mode in modes:
+        if mode not in ("engine", "stream", "batch"):
+            parser.error(f"unknown mode {mode!r}")
+    for pair in pairs or ():
+        if len(pair) != 2 or pair[0] not in LANGUAGES or pair[1] not in LANGUAGES:
+            parser.error(f"invalid pair {':'.join(pair)!r}")
+    
+    report = run_benchmarks(sizes, pairs, modes, args.jobs,
+                            log=lambda entry: print(format_entry(entry), file=sys.stderr))
+    write_report(report, args.output)
+    return 0
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    
+    try:
+        if args.command == "convert":
+            return run_convert(args)
+        if args.command == "bench":
+            return run_bench_command(args, parser)
+        return run_batch_command(args)
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
@@ -0,0 +1,173 @@
+import os
+import re
+from collections import namedtuple
+
+from convert_hub.engine import LANGUAGES
+from convert_hub.lexer import IDENTIFIER, PREPROCESSOR, PUNCT, TRIVIA, iter_tokens
+
+# language is the best guess (None without any evidence), confidence its share of the
+# total score and scores the raw evidence per language
+Detection = namedtuple("Detection", "language confidence scores")
+
+# Source language choice that picks one per file from its contents
+AUTO_DETECT = "Auto"
+
+# Only the start of a file is classified; includes, usings and the first declarations
+# are almost always enough, and it keeps detection cheap however large the file is
+DETECT_CHARS = 8 << 10
+
+# Evidence per significant token: {text: {language: weight}}. Markers that only one
+# language has weigh most; C is the baseline that C++ mostly extends, so C-style code
+# counts towards C unless something C++-only turns up.
+TOKEN_WEIGHTS = {
+    "std": {"C++": 3},
+    "::": {"C++": 1},
+    "template": {"C++": 4},
+    "typename": {"C++": 3},
+    "nullptr": {"C++": 3},
+    "cout": {"C++": 3},
+    "cin": {"C++": 3},
+    "cerr": {"C++": 3},
+    "endl": {"C++": 3},
+    "virtual": {"C++": 2},
+    "operator": {"C++": 2},
+    "friend": {"C++": 2},
+    "constexpr": {"C++": 3},
+    "static_cast": {"C++": 4},
+    "dynamic_cast": {"C++": 4},
+    "reinterpret_cast": {"C++": 4},
+    "const_cast": {"C++": 4},
+    "delete": {"C++": 2},
+    "auto": {"C++": 1},
+    "new": {"C++": 1, "C#": 1},
+    "this": {"C++": 1, "C#": 1},
+    "class": {"C++": 1, "C#": 1},
+    "namespace": {"C++": 1, "C#": 1},
+    "bool": {"C++": 1, "C#": 1},
+    "override": {"C++": 1, "C#": 2},
+    "Console": {"C#": 4},
+    "System": {"C#": 3},
+    "foreach": {"C#": 3},
+    "readonly": {"C#": 3},
+    "sealed": {"C#": 3},
+    "internal": {"C#": 2},
+    "string": {"C#": 2},
+    "null": {"C#": 2},
+    "Main": {"C#": 2},
+    "NULL": {"C": 1},
+    "printf": {"C": 2, "C++": 1},
+    "fprintf": {"C": 2, "C++": 1},
+    "scanf": {"C": 2, "C++": 1},
+    "malloc": {"C": 2, "C++": 1},
+    "calloc": {"C": 2},
+    "realloc": {"C": 2},
+    "free": {"C": 1},
+    "typedef": {"C": 1, "C++": 1},
+    "struct": {"C": 1, "C++": 1},
+    "restrict": {"C": 3},
+    "_Bool": {"C": 3},
+    "->": {"C": 1, "C++": 1},
+}
+
+# Evidence per pair of consecutive significant tokens, on top of TOKEN_WEIGHTS
+PAIR_WEIGHTS = {
+    ("using", "System"): {"C#": 5},
+    ("using", "namespace"): {"C++": 5},
+    ("public", ":"): {"C++": 3},
+    ("private", ":"): {"C++": 3},
+    ("protected", ":"): {"C++": 3},
+    ("public", "class"): {"C#": 3},
+    ("public", "static"): {"C#": 3},
+    ("private", "static"): {"C#": 2},
+    ("typedef", "struct"): {"C": 2},
+    ("struct", "{"): {"C": 1},
+}
+
+INCLUDE_PATTERN = re.compile(r'#\s*include\s*[<"]([^>"]*)[>"]')
+
+# Directives only C# has; every other directive rules C# out a little
+CSHARP_DIRECTIVE_PATTERN = re.compile(r"#\s*(?:region|endregion|nullable)\b")
+
+# A known extension tips the balance when the contents say little
+EXTENSION_WEIGHTS = {
+    ".c": {"C": 3},
+    ".h": {"C": 1, "C++": 1},
+    ".cpp": {"C++": 3},
+    ".cc": {"C++": 3},
+    ".cxx": {"C++": 3},
+    ".hpp": {"C++": 3},
+    ".hh": {"C++": 3},
+    ".cs": {"C#": 3},
+}
+
+
+def add_weights(scores, weights):
+    for language, weight in weights.items():
+        scores[language] += weight
+
+
+def directive_weights(text):
+    if CSHARP_DIRECTIVE_PATTERN.match(text):
+        return {"C#": 4}
+    match = INCLUDE_PATTERN.match(text)
+    if match:
+        # <cstdio>, <vector> and friends are C++; <stdio.h> is C but often seen in C++
+        header = match.group(1)
+        if header.endswith((".hpp", ".hh")) or "." not in header:
+            return {"C++": 4}
+        return {"C": 2, "C++": 1}
+    return {"C": 1, "C++": 1}
+
+
+def detect_language(source, ext=""):
+    # Scores the first DETECT_CHARS characters of source by keyword and token frequency,
+    # plus the file extension when given. Ties go to the earlier entry of LANGUAGES.
+    scores = dict.fromkeys(LANGUAGES, 0)
+    add_weights(scores, EXTENSION_WEIGHTS.get(ext.lower(), {}))
+    
+    previous = None
+    for token in iter_tokens(source[:DETECT_CHARS]):
+        if token.kind in TRIVIA:
+            continue
+        if token.kind == PREPROCESSOR:
+            add_weights(scores, directive_weights(token.text.strip()))
+            previous = None
+            continue
+        if token.kind in (IDENTIFIER, PUNCT):
+            text = token.text
+            weights = TOKEN_WEIGHTS.get(text)
+            if weights:
+                add_weights(scores, weights)
+            weights = PAIR_WEIGHTS.get((previous, text))
+            if weights:
+                add_weights(scores, weights)
+            previous = text
+        else:
+            previous = None
+    
+    total = sum(scores.values())
+    if not total:
+        return Detection(None, 0.0, scores)
+    language = max(LANGUAGES, key=lambda name: scores[name])
+    return Detection(language, scores[language] / total, scores)
+
+
+# {path: (stamp, Detection)} for files classified by this process
+_detections = {}
+
+
+def detect_file(path):
+    # Cached per file until its mtime or size changes, so batch runs and repeated loads
+    # only read each file once
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    cached = _detections.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    
+    with open(path, 'r', encoding='utf-8', errors='replace') as file:
+        source = file.read(DETECT_CHARS)
+    detection = detect_language(source, os.path.splitext(path)[1])
+    _detections[path] = (stamp, detection)
+    return detection
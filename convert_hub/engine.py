@@ -0,0 +1,611 @@
+import re
+
+from convert_hub.includes import LOCAL_INCLUDE_PATTERN
+from convert_hub.lexer import (COMMENT, COMMENT_CODE, IDENTIFIER, IDENTIFIER_CODE, NEWLINE,
+                               PREPROCESSOR_CODE, PUNCT, TRIVIA, WHITESPACE, WHITESPACE_CODE,
+                               tokenize, next_significant)
+from convert_hub.profiling import StageTimer
+from convert_hub.rules import MATCH, get_rule_table
+
+LANGUAGES = ("C", "C++", "C#")
+
+# Part of every cache key; bump whenever a change alters conversion output
+ENGINE_VERSION = "7"
+
+# Mirrors the checkbox defaults in the GUI
+DEFAULT_OPTIONS = {
+    "preserve_comments": True,
+    "convert_oo": True,
+    "optimize_code": False,
+    "include_metadata": True,
+}
+
+# Number of tokens rewritten between progress updates / cancel checks
+CHUNK_TOKENS = 20000
+
+
+def get_extension(language):
+    if language == "C":
+        return ".c"
+    elif language == "C++":
+        return ".cpp"
+    elif language == "C#":
+        return ".cs"
+    return ".txt"
+
+
+def conversion_header(from_lang, to_lang, options):
+    if not options.get("include_metadata", True):
+        return ""
+    header = f"// Converted from {from_lang} to {to_lang}\n"
+    header += f"// Settings: Preserve comments={options['preserve_comments']}, "
+    header += f"Convert OOP={options['convert_oo']}, "
+    header += f"Optimize={options['optimize_code']}\n\n"
+    return header
+
+
+# Rules key preprocessor directives on this, which can never be an identifier
+DIRECTIVE_TRIGGER = "#"
+
+# Rules key comments (and the whitespace before them) on this, which can never be one either
+COMMENT_TRIGGER = "//"
+
+# A mapped name right after one of these is a member, not the API it is named after
+MEMBER_ACCESS = (".", "->", "::")
+
+# Pairs where convert_oo turns functions taking a struct pointer first into its methods
+METHOD_PAIRS = (("C", "C++"),)
+
+# Target languages with headers; only their outputs #include converted files by name
+HEADER_LANGUAGES = ("C", "C++")
+
+# Returned by a rule whose lookahead ran off the end of the tokens it was given; when
+# streaming, the trigger is retried once more of the source has been tokenized
+INCOMPLETE = "incomplete"
+
+
+BRACKETS = {"{": "}", "(": ")", "[": "]"}
+
+
+def find_matching_brace(tokens, index):
+    # tokens[index] is the opening "{", "(" or "["
+    opening = tokens[index].text
+    closing = BRACKETS[opening]
+    depth = 0
+    for i in range(index, len(tokens)):
+        if tokens[i].kind == PUNCT:
+            if tokens[i].text == opening:
+                depth += 1
+            elif tokens[i].text == closing:
+                depth -= 1
+                if depth == 0:
+                    return i
+    return None
+
+
+def find_closing_paren(tokens, index):
+    # Like find_matching_brace for the "(" at index, but returns -1 on reaching a brace or
+    # ";" first. Argument lists hardly ever contain those, and stopping there keeps the
+    # search inside the declaration it started in.
+    depth = 0
+    for i in range(index, len(tokens)):
+        if tokens[i].kind != PUNCT:
+            continue
+        text = tokens[i].text
+        if text == "(":
+            depth += 1
+        elif text == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+        elif text in ("{", "}", ";"):
+            return -1
+    return None
+
+
+def split_arguments(tokens, open_index, close_index):
+    # (start, end) index ranges of the comma-separated items between a pair of parens
+    if next_significant(tokens, open_index + 1) == close_index:
+        return []
+    ranges = []
+    start = open_index + 1
+    depth = 0
+    for i in range(open_index + 1, close_index):
+        if tokens[i].kind != PUNCT:
+            continue
+        if tokens[i].text in BRACKETS:
+            depth += 1
+        elif tokens[i].text in BRACKETS.values():
+            depth -= 1
+        elif tokens[i].text == "," and depth == 0:
+            ranges.append((start, i))
+            start = i + 1
+    ranges.append((start, close_index))
+    return ranges
+
+
+def parse_pointer_param(texts):
+    # Significant token texts of a parameter like "const struct User *user". Returns
+    # (type_name, points_to_const, name) for a single pointer to a named type, else None.
+    index = 0
+    const = False
+    while index < len(texts) and texts[index] in ("const", "volatile", "struct"):
+        const = const or texts[index] == "const"
+        index += 1
+    if index >= len(texts) or not texts[index].isidentifier():
+        return None
+    type_name = texts[index]
+    index += 1
+    while index < len(texts) and texts[index] in ("const", "volatile"):
+        const = const or texts[index] == "const"
+        index += 1
+    if index >= len(texts) or texts[index] != "*":
+        return None
+    index += 1
+    while index < len(texts) and texts[index] in ("const", "volatile"):
+        index += 1
+    name = None
+    if index < len(texts) and texts[index].isidentifier():
+        name = texts[index]
+        index += 1
+    if index != len(texts):
+        return None
+    return type_name, const, name
+
+
+def significant_texts(tokens, start, end):
+    return [token.text for token in tokens[start:end] if token.kind not in TRIVIA]
+
+
+def drop_token(tokens, index, edits):
+    # Removes a token together with the whitespace that follows it
+    edits[index] = ""
+    if index + 1 < len(tokens) and tokens[index + 1].kind == WHITESPACE:
+        edits[index + 1] = ""
+
+
+def rewrite_typedef_struct(tokens, index, edits):
+    # typedef struct [Tag] { ... } Name;  ->  struct Name { ... };
+    struct_index = next_significant(tokens, index + 1)
+    if struct_index >= len(tokens):
+        return INCOMPLETE
+    if tokens[struct_index].text != "struct":
+        return None
+    
+    brace_index = next_significant(tokens, struct_index + 1)
+    tag = None
+    if brace_index < len(tokens) and tokens[brace_index].kind == IDENTIFIER:
+        tag = tokens[brace_index].text
+        brace_index = next_significant(tokens, brace_index + 1)
+    if brace_index >= len(tokens):
+        return INCOMPLETE
+    if tokens[brace_index].text != "{":
+        return None
+    
+    close_index = find_matching_brace(tokens, brace_index)
+    if close_index is None:
+        return INCOMPLETE
+    name_index = next_significant(tokens, close_index + 1)
+    semi_index = next_significant(tokens, name_index + 1)
+    if semi_index >= len(tokens):
+        return INCOMPLETE
+    if tokens[name_index].kind != IDENTIFIER or tokens[semi_index].text != ";":
+        return None
+    
+    name = tokens[name_index].text
+    if tag is not None and tag != name:
+        # typedef struct tag { ... } Other; is already valid C++
+        return None
+    
+    drop_token(tokens, index, edits)
+    if tag is None:
+        edits[struct_index] = f"struct {name}"
+    for i in range(close_index + 1, semi_index):
+        edits[i] = ""
+    return None
+
+
+def rewrite_public_class(tokens, index, edits):
+    # public class Foo  ->  class Foo
+    class_index = next_significant(tokens, index + 1)
+    if class_index >= len(tokens):
+        return INCOMPLETE
+    if tokens[class_index].text == "class":
+        drop_token(tokens, index, edits)
+    return None
+
+
+def follows_member_access(tokens, index):
+    # Looks back past one whitespace token at most; streaming keeps that many tokens in
+    # front of every window, so this sees the same tokens whichever way the source was
+    # split
+    index -= 1
+    while index >= 0 and tokens[index].kind == WHITESPACE:
+        index -= 1
+    return index >= 0 and tokens[index].text in MEMBER_ACCESS
+
+
+def make_mapping_rule(trie):
+    # Rule for every declarative mapping sharing one trigger; trie is the compiled node
+    # below the trigger
+    def rewrite_mapping(tokens, index, edits):
+        if follows_member_access(tokens, index):
+            return None
+        node = trie
+        last_index = index
+        while MATCH not in node:
+            last_index = next_significant(tokens, last_index + 1)
+            if last_index >= len(tokens):
+                return INCOMPLETE
+            node = node.get(tokens[last_index].text)
+            if node is None:
+                return None
+        edits[index] = node[MATCH]
+        for i in range(index + 1, last_index + 1):
+            edits[i] = ""
+        return None
+    return rewrite_mapping
+
+
+def make_include_rule(headers):
+    # One alternation over every mapped header; longest names first so that no header is
+    # shadowed by a shorter one it starts with
+    names = sorted(headers, key=len, reverse=True)
+    pattern = re.compile(r"^([ \t]*#[ \t]*include[ \t]*<)(%s)>"
+                         % "|".join(map(re.escape, names)))
+    
+    def rewrite_include(tokens, index, edits):
+        text = tokens[index].text
+        match = pattern.match(text)
+        if match:
+            edits[index] = f"{match.group(1)}{headers[match.group(2)]}>{text[match.end():]}"
+        return None
+    return rewrite_include
+
+
+def method_declaration(name, method):
+    const = " const" if method.const else ""
+    return f"{method.returns} {name}({method.params}){const};"
+
+
+def insert_method_declarations(tokens, close_index, declarations, edits):
+    # Declares the methods just before the closing brace of their struct, one per line
+    # at the indentation of the brace plus four spaces
+    indent_index = close_index
+    if close_index > 0 and tokens[close_index - 1].kind == WHITESPACE:
+        indent_index = close_index - 1
+    if indent_index > 0 and tokens[indent_index - 1].kind == NEWLINE:
+        newline = tokens[indent_index - 1].text
+        indent = tokens[indent_index].text if indent_index != close_index else ""
+        lines = "".join(f"{indent}    {declaration}{newline}" for declaration in declarations)
+        if indent_index != close_index:
+            edits[indent_index] = ""
+        edits[close_index] = f"{lines}{indent}}}"
+    else:
+        edits[close_index] = f"{' '.join(declarations)} }}"
+
+
+def simple_operand(texts):
+    # A name, member chain or subscript that needs no parentheses in front of "->" or "."
+    return all(text.isidentifier() or text.isdigit() or text in (".", "->", "[", "]")
+               for text in texts)
+
+
+def make_method_rule(methods):
+    # Rule for every name in methods: its definition becomes Class::name with the object
+    # parameter turned into this, and a call name(obj, ...) becomes obj->name(...)
+    def rewrite_method(tokens, index, edits):
+        if follows_member_access(tokens, index):
+            return None
+        name = tokens[index].text
+        method = methods[name]
+        open_index = next_significant(tokens, index + 1)
+        if open_index >= len(tokens):
+            return INCOMPLETE
+        if tokens[open_index].text != "(":
+            return None
+        close_index = find_closing_paren(tokens, open_index)
+        if close_index is None:
+            return INCOMPLETE
+        if close_index < 0:
+            return None
+        arguments = split_arguments(tokens, open_index, close_index)
+        if not arguments:
+            return None
+        
+        first_start, first_end = arguments[0]
+        # Everything from the first argument up to the second one (or the closing paren)
+        removed_end = arguments[1][0] if len(arguments) > 1 else close_index
+        while removed_end < close_index and tokens[removed_end].kind == WHITESPACE:
+            removed_end += 1
+        
+        param = parse_pointer_param(significant_texts(tokens, first_start, first_end))
+        if param is not None:
+            # A declaration; only definitions are rewritten, prototypes are left as they are
+            brace_index = next_significant(tokens, close_index + 1)
+            if brace_index >= len(tokens):
+                return INCOMPLETE
+            if tokens[brace_index].text != "{":
+                return None
+            end_index = find_matching_brace(tokens, brace_index)
+            if end_index is None:
+                return INCOMPLETE
+            
+            edits[index] = f"{method.class_name}::{name}"
+            for i in range(first_start, removed_end):
+                edits[i] = ""
+            if method.const:
+                edits[close_index] = ") const"
+            param_name = param[2]
+            for i in range(brace_index + 1, end_index):
+                if (tokens[i].kind == IDENTIFIER and tokens[i].text == param_name
+                        and not follows_member_access(tokens, i)):
+                    edits[i] = "this"
+            return None
+        
+        # A call: the first argument becomes the object the method is called on
+        texts = [edits.get(i, tokens[i].text) for i in range(first_start, first_end)
+                 if tokens[i].kind not in TRIVIA]
+        if not texts:
+            return None
+        if texts[0] == "&" and len(texts) > 1 and simple_operand(texts[1:]):
+            receiver = f"{''.join(texts[1:])}."
+        elif simple_operand(texts):
+            receiver = f"{''.join(texts)}->"
+        else:
+            operand = "".join(edits.get(i, tokens[i].text)
+                              for i in range(first_start, first_end)).strip()
+            receiver = f"({operand})->"
+        edits[index] = f"{receiver}{name}"
+        for i in range(first_start, removed_end):
+            edits[i] = ""
+        return None
+    return rewrite_method
+
+
+def make_struct_rule(declarations):
+    # struct Name { ... }  ->  the same struct with its methods declared at the end
+    def rewrite_struct(tokens, index, edits):
+        name_index = next_significant(tokens, index + 1)
+        brace_index = next_significant(tokens, name_index + 1)
+        if brace_index >= len(tokens):
+            return INCOMPLETE
+        if tokens[name_index].text not in declarations or tokens[brace_index].text != "{":
+            return None
+        close_index = find_matching_brace(tokens, brace_index)
+        if close_index is None:
+            return INCOMPLETE
+        insert_method_declarations(tokens, close_index, declarations[tokens[name_index].text],
+                                   edits)
+        return None
+    return rewrite_struct
+
+
+def make_typedef_rule(typedef_rule, declarations):
+    # typedef struct [Tag] { ... } Name;  ->  as typedef_rule rewrites it, with the methods
+    # of Tag (or Name when there is no tag) declared at the end of the body
+    def rewrite_typedef(tokens, index, edits):
+        struct_index = next_significant(tokens, index + 1)
+        name_index = next_significant(tokens, struct_index + 1)
+        if name_index >= len(tokens):
+            return INCOMPLETE
+        class_name = None
+        close_index = None
+        if tokens[struct_index].text == "struct":
+            brace_index = name_index
+            if tokens[name_index].kind == IDENTIFIER:
+                brace_index = next_significant(tokens, name_index + 1)
+            if brace_index >= len(tokens):
+                return INCOMPLETE
+            if tokens[brace_index].text == "{":
+                close_index = find_matching_brace(tokens, brace_index)
+                if close_index is None:
+                    return INCOMPLETE
+                alias_index = next_significant(tokens, close_index + 1)
+                if alias_index >= len(tokens):
+                    return INCOMPLETE
+                if brace_index != name_index:
+                    class_name = tokens[name_index].text
+                else:
+                    class_name = tokens[alias_index].text
+        
+        result = typedef_rule(tokens, index, edits) if typedef_rule else None
+        if result != INCOMPLETE and class_name in declarations:
+            insert_method_declarations(tokens, close_index, declarations[class_name], edits)
+        return result
+    return rewrite_typedef
+
+
+def make_method_rules(methods, rules):
+    declarations = {}
+    for name, method in methods.items():
+        declarations.setdefault(method.class_name, []).append(method_declaration(name, method))
+    
+    method_rules = dict.fromkeys(methods, make_method_rule(methods))
+    method_rules["struct"] = make_struct_rule(declarations)
+    method_rules["typedef"] = make_typedef_rule(rules.get("typedef"), declarations)
+    return method_rules
+
+
+LINE_BREAK_PATTERN = re.compile(r"\r?\n")
+
+
+def ends_line(tokens, index):
+    # Whether the comment at index is the last thing on its line
+    if tokens[index].text.startswith("//"):
+        return True
+    return index + 1 >= len(tokens) or tokens[index + 1].kind == NEWLINE
+
+
+def strip_comment(tokens, index, edits):
+    # Rule for comments and whitespace with preserve_comments off. Whitespace only goes
+    # when a line comment follows it, so no line is left ending in spaces. A block comment
+    # keeps its line breaks so the lines after it stay where they were, and becomes a
+    # space when nothing else would separate the tokens around it.
+    token = tokens[index]
+    following = tokens[index + 1] if index + 1 < len(tokens) else None
+    if token.kind == WHITESPACE:
+        if following is not None and following.kind == COMMENT and \
+                ends_line(tokens, index + 1):
+            edits[index] = ""
+        return None
+    if token.text.startswith("//"):
+        edits[index] = ""
+        return None
+    breaks = "".join(LINE_BREAK_PATTERN.findall(token.text))
+    if not breaks and following is not None and following.kind not in (WHITESPACE, NEWLINE):
+        breaks = " "
+    edits[index] = breaks
+    return None
+
+
+def make_local_include_rule(includes, directive_rule):
+    # Renames includes of headers converted in the same batch, leaving every other
+    # directive to the pair's own directive rule
+    def rewrite_local_include(tokens, index, edits):
+        text = tokens[index].text
+        match = LOCAL_INCLUDE_PATTERN.match(text)
+        if match and match.group(2) in includes:
+            edits[index] = f'{match.group(1)}{includes[match.group(2)]}"{text[match.end():]}'
+            return None
+        return directive_rule(tokens, index, edits) if directive_rule else None
+    return rewrite_local_include
+
+
+# Hand-written rewrite rules per language pair, keyed on the identifier that triggers them.
+# A rule only looks ahead from its trigger and records replacement text per token index
+# in edits. Plain API renames belong in the declarative tables in convert_hub.rules.
+RULES = {
+    ("C", "C++"): {
+        "typedef": rewrite_typedef_struct,
+    },
+    ("C#", "C++"): {
+        "public": rewrite_public_class,
+    },
+}
+
+_pair_rules = {}
+
+
+def get_rules(from_lang, to_lang, methods=None, includes=None, strip_comments=False):
+    # RULES for the pair merged with its compiled mapping table, built once per process.
+    # methods maps function names to the convert_hub.symbols.Method they become; the
+    # caller passes it only when convert_oo is on. includes maps #include "names" to
+    # their converted names. strip_comments drops comments (preserve_comments off).
+    pair = (from_lang, to_lang)
+    if pair not in _pair_rules:
+        table = get_rule_table(from_lang, to_lang)
+        rules = {trigger: make_mapping_rule(node) for trigger, node in table["tokens"].items()}
+        if table["headers"]:
+            rules[DIRECTIVE_TRIGGER] = make_include_rule(table["headers"])
+        
+        handwritten = RULES.get(pair, {})
+        overlap = rules.keys() & handwritten.keys()
+        if overlap:
+            raise ValueError(f"Mappings for {from_lang} -> {to_lang} clash with rules: "
+                             f"{', '.join(sorted(overlap))}")
+        rules.update(handwritten)
+        _pair_rules[pair] = rules
+    
+    rules = _pair_rules[pair]
+    methods = methods if pair in METHOD_PAIRS else None
+    includes = includes if to_lang in HEADER_LANGUAGES else None
+    if methods or includes or strip_comments:
+        rules = dict(rules)
+        if methods:
+            rules.update(make_method_rules(methods, rules))
+        if includes:
+            rules[DIRECTIVE_TRIGGER] = make_local_include_rule(includes,
+                                                               rules.get(DIRECTIVE_TRIGGER))
+        if strip_comments:
+            rules[COMMENT_TRIGGER] = strip_comment
+    return rules
+
+
+def rewrite_tokens(tokens, rules, edits, start, end, final=True, line_map=None):
+    # Rewrites tokens[start:end] of a TokenArray and returns (converted_text, stop). stop
+    # is end unless a rule needed tokens beyond the end of the array and final is False,
+    # in which case everything from the rule's trigger onwards is left for the caller to
+    # retry. Only kind codes are read per token; text between edits is copied from the
+    # source in one slice. A convert_hub.sourcemap.LineMap is told about every copied
+    # slice and every replaced token, in order.
+    source = tokens.source
+    origin = tokens.origin
+    kinds = tokens.kinds
+    starts = tokens.starts
+    directive_rule = rules.get(DIRECTIVE_TRIGGER)
+    comment_rule = rules.get(COMMENT_TRIGGER)
+    parts = []
+    copied = starts[start] - origin
+    for i in range(start, end):
+        kind = kinds[i]
+        if kind == IDENTIFIER_CODE:
+            rule = rules.get(source[starts[i] - origin:starts[i + 1] - origin])
+        elif kind == PREPROCESSOR_CODE:
+            rule = directive_rule
+        elif kind == COMMENT_CODE or kind == WHITESPACE_CODE:
+            rule = comment_rule
+        else:
+            rule = None
+        if rule is not None and i not in edits:
+            if rule(tokens, i, edits) == INCOMPLETE and not final:
+                parts.append(source[copied:starts[i] - origin])
+                if line_map is not None:
+                    line_map.copied(parts[-1])
+                return "".join(parts), i
+        if i in edits:
+            parts.append(source[copied:starts[i] - origin])
+            parts.append(edits.pop(i))
+            if line_map is not None:
+                line_map.copied(parts[-2])
+                line_map.replaced(source[starts[i] - origin:starts[i + 1] - origin], parts[-1])
+            copied = starts[i + 1] - origin
+    parts.append(source[copied:starts[end] - origin])
+    if line_map is not None:
+        line_map.copied(parts[-1])
+    return "".join(parts), end
+
+
+def iter_rewrite(tokens, from_lang, to_lang, chunk_tokens=CHUNK_TOKENS, timer=None,
+                 methods=None, strip_comments=False):
+    # Single pass over the token stream. Yields (converted_text, tokens_done, total_tokens)
+    # every chunk_tokens tokens so callers can report progress and stop between chunks.
+    timer = timer or StageTimer()
+    rules = get_rules(from_lang, to_lang, methods, strip_comments=strip_comments)
+    edits = {}
+    total = len(tokens)
+    
+    for start in range(0, total, chunk_tokens):
+        end = min(start + chunk_tokens, total)
+        with timer.stage("rewrite"):
+            text, _ = rewrite_tokens(tokens, rules, edits, start, end)
+        yield text, end, total
+
+
+def convert_chunk(source, from_lang, to_lang):
+    return "".join(part for part, _, _ in iter_rewrite(tokenize(source), from_lang, to_lang))
+
+
+def iter_conversion(source, from_lang, to_lang, options, chunk_tokens=CHUNK_TOKENS,
+                    timer=None, methods=None):
+    # Pass a StageTimer to collect lex/rewrite timings
+    timer = timer or StageTimer()
+    with timer.stage("lex"):
+        tokens = tokenize(source)
+    yield conversion_header(from_lang, to_lang, options), 0, len(tokens)
+    parts = iter_rewrite(tokens, from_lang, to_lang, chunk_tokens, timer, methods,
+                         not options["preserve_comments"])
+    if options.get("optimize_code"):
+        # Imported here because optimize builds on the helpers of this module
+        from convert_hub.optimize import iter_optimize_progress
+        parts = iter_optimize_progress(parts, to_lang, timer)
+    yield from parts
+
+
+def convert_source(source, from_lang, to_lang, options=None, timer=None, methods=None):
+    options = options or DEFAULT_OPTIONS
+    timer = timer or StageTimer()
+    parts = [part for part, _, _ in iter_conversion(source, from_lang, to_lang, options,
+                                                    timer=timer, methods=methods)]
+    with timer.stage("assemble"):
+        return "".join(parts)
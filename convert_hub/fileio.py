@@ -0,0 +1,97 @@
+import asyncio
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# Files read or written at the same time by AsyncFileIO. Network mounts serve many
+# requests at once, so a dozen in flight hides most of their latency.
+IO_CONCURRENCY = 16
+
+# Files up to this size are prefetched by the batch parent and converted from memory;
+# larger ones are streamed by the worker itself so its memory stays bounded
+PREFETCH_FILE_SIZE = 4 << 20
+
+# Jobs per worker that may be prefetched, converting or waiting to be written at once
+PREFETCH_DEPTH = 2
+
+# Permissions open() gives a new file; mkstemp makes its files private to the owner
+_umask = os.umask(0)
+os.umask(_umask)
+NEW_FILE_MODE = 0o666 & ~_umask
+
+
+@contextmanager
+def atomic_output(path, mode='w'):
+    # Yields a file next to path that replaces path only once the block succeeds, so a
+    # failed or cancelled conversion never leaves a truncated output behind
+    directory = os.path.dirname(path) or "."
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        if 'b' in mode:
+            file = os.fdopen(fd, mode)
+        else:
+            file = os.fdopen(fd, mode, encoding='utf-8')
+        with file:
+            # A replaced file keeps its permissions, a new one gets the usual ones
+            try:
+                permissions = os.stat(path).st_mode & 0o7777
+            except OSError:
+                permissions = NEW_FILE_MODE
+            os.chmod(temp_path, permissions)
+            yield file
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def read_text(path, limit=None):
+    # None when the file is larger than limit bytes
+    with open(path, 'r', encoding='utf-8') as file:
+        if limit is not None and os.fstat(file.fileno()).st_size > limit:
+            return None
+        return file.read()
+
+
+def write_text(path, text):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with atomic_output(path) as file:
+        file.write(text)
+
+
+class AsyncFileIO:
+    # Blocking file calls run on a thread pool and are awaited from asyncio, at most
+    # concurrency of them at a time. timer, when given, gets the time each call took,
+    # waiting for a free thread included, under "prefetch" and "output".
+    
+    def __init__(self, concurrency=IO_CONCURRENCY, timer=None):
+        self.executor = ThreadPoolExecutor(max_workers=concurrency,
+                                           thread_name_prefix="convert-io")
+        self.timer = timer
+    
+    async def run(self, stage, function, *args):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self.executor, function, *args)
+        finally:
+            if self.timer:
+                self.timer.add(stage, time.perf_counter() - start)
+    
+    async def read(self, path, limit=None):
+        return await self.run("prefetch", read_text, path, limit)
+    
+    async def write(self, path, text):
+        await self.run("output", write_text, path, text)
+    
+    def close(self):
+        self.executor.shutdown(wait=True)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,91 @@
+import os
+import re
+
+# Only quoted includes can name files of the tree being converted. Group 1 is everything
+# up to the name, group 2 the name; the include rewriter matches it against one directive.
+LOCAL_INCLUDE_PATTERN = re.compile(r'^([ \t]*#[ \t]*include[ \t]*")([^"\n]+)"', re.MULTILINE)
+
+
+def scan_includes(path):
+    # A regex over the raw text is enough to find include lines and far cheaper than
+    # tokenizing; a file that cannot be read includes nothing
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return [name for _, name in LOCAL_INCLUDE_PATTERN.findall(file.read())]
+    except (OSError, ValueError):
+        return []
+
+
+class IncludeGraph:
+    # Which files of a batch include which, built once per run. Quoted includes are
+    # resolved against the including file's directory first, then against any file of
+    # the tree whose path ends with the spelled name (covering -I style include dirs).
+    # names, {path: spelled includes} of an earlier graph, spares rereading the files
+    # known not to have changed since.
+    
+    def __init__(self, paths, names=None):
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.known = set(self.paths)
+        self.by_name = {}
+        for path in self.paths:
+            self.by_name.setdefault(os.path.basename(path), []).append(path)
+        
+        self.names = {}
+        for path in self.paths:
+            self.names[path] = names[path] if names and path in names else scan_includes(path)
+        
+        # {path: {spelled_name: included_path}}
+        self.includes = {path: self.resolve(path) for path in self.paths}
+    
+    def resolve(self, path):
+        resolved = {}
+        for name in self.names[path]:
+            candidate = os.path.normpath(os.path.join(os.path.dirname(path), name))
+            if candidate not in self.known:
+                suffix = os.sep + os.path.normpath(name).lstrip("." + os.sep)
+                matches = [other for other in self.by_name.get(os.path.basename(name), ())
+                           if other.endswith(suffix)]
+                candidate = matches[0] if len(matches) == 1 else None
+            if candidate and candidate != path:
+                resolved[name] = candidate
+        return resolved
+    
+    def rescan(self, paths):
+        # Reads the includes of paths, files of the graph whose contents changed, again;
+        # files added or removed need a new graph
+        for path in paths:
+            self.names[path] = scan_includes(path)
+            self.includes[path] = self.resolve(path)
+    
+    def order(self):
+        # Every file after the files it includes; cycles are broken in the original order
+        ordered = []
+        state = {}
+        for root in self.paths:
+            if root in state:
+                continue
+            state[root] = "open"
+            stack = [(root, iter(self.includes[root].values()))]
+            while stack:
+                path, pending = stack[-1]
+                for dependency in pending:
+                    if dependency not in state:
+                        state[dependency] = "open"
+                        stack.append((dependency, iter(self.includes[dependency].values())))
+                        break
+                else:
+                    stack.pop()
+                    state[path] = "done"
+                    ordered.append(path)
+        return ordered
+    
+    def renames(self, path, output_files):
+        # {spelled_name: new_name} for includes of path whose target changes extension
+        # when converted, e.g. "../include/user.h" -> "../include/user.hpp"
+        renamed = {}
+        for name, target in self.includes.get(os.path.abspath(path), {}).items():
+            old_ext = os.path.splitext(target)[1]
+            new_ext = os.path.splitext(output_files.get(target, target))[1]
+            if old_ext != new_ext and name.endswith(old_ext):
+                renamed[name] = name[:len(name) - len(old_ext)] + new_ext
+        return renamed
@@ -0,0 +1,122 @@
+from bisect import bisect_right
+
+from convert_hub.engine import conversion_header, get_rules, rewrite_tokens
+from convert_hub.lexer import TokenArray, iter_segments, iter_tokens
+from convert_hub.optimize import optimize_source
+from convert_hub.symbols import resolve_methods, scan_tokens, wants_methods
+
+def common_prefix_length(a, b):
+    # Binary search over slice comparisons, which run at C speed
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def common_suffix_length(a, b, limit):
+    low, high = 0, min(len(a), len(b), limit)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[len(a) - middle:] == b[len(b) - middle:]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+class IncrementalConverter:
+    # Keeps the converted output of a buffer split per top-level declaration, so an edit
+    # only reconverts the declarations it touches
+    
+    def __init__(self, from_lang, to_lang, options):
+        self.from_lang = from_lang
+        self.to_lang = to_lang
+        self.strip_comments = not options["preserve_comments"]
+        self.rules = get_rules(from_lang, to_lang, strip_comments=self.strip_comments)
+        self.header = conversion_header(from_lang, to_lang, options)
+        self.optimize = options.get("optimize_code")
+        self.source = ""
+        self.starts = []
+        self.ends = []
+        self.converted = []
+        # With convert_oo, the symbols each declaration contributes to the method map
+        self.track_methods = wants_methods(from_lang, to_lang, options)
+        self.methods = {}
+        self.symbols = []
+    
+    @property
+    def output(self):
+        return self.header + "".join(self.converted)
+    
+    def convert_segment(self, tokens):
+        tokens = TokenArray.from_tokens(tokens)
+        text, _ = rewrite_tokens(tokens, self.rules, {}, 0, len(tokens))
+        if self.optimize:
+            # Optimizations stay inside one declaration, so this matches optimizing the
+            # whole output
+            text = optimize_source(text, self.to_lang)
+        return text
+    
+    def update(self, source):
+        # Returns (output_start, output_end, replacement): the span of the previous output
+        # to replace to get the new one, or None if nothing changed
+        old = self.source
+        if source == old:
+            return None
+        
+        prefix = common_prefix_length(old, source)
+        suffix = common_suffix_length(old, source, min(len(old), len(source)) - prefix)
+        old_change_end = len(old) - suffix
+        delta = len(source) - len(old)
+        
+        # Step back one declaration: an edit at a boundary can merge it with the previous one
+        first = max(bisect_right(self.ends, prefix) - 1, 0)
+        restart = self.starts[first] if first < len(self.starts) else 0
+        
+        # Re-segment from the restart point until a new boundary lands on an old boundary
+        # past the edit; everything after it is unchanged apart from its offsets
+        starts, ends, converted, symbols = [], [], [], []
+        last = len(self.ends)
+        for segment in iter_segments(iter_tokens(source, restart)):
+            start = segment[0].start
+            end = segment[-1].start + len(segment[-1].text)
+            starts.append(start)
+            ends.append(end)
+            converted.append(self.convert_segment(segment))
+            if self.track_methods:
+                symbols.append(scan_tokens(segment))
+            
+            old_end = end - delta
+            if old_end >= old_change_end:
+                index = bisect_right(self.ends, old_end) - 1
+                if index >= first and self.ends[index] == old_end:
+                    last = index + 1
+                    break
+        
+        output_start = len(self.header) + sum(len(text) for text in self.converted[:first])
+        output_end = output_start + sum(len(text) for text in self.converted[first:last])
+        replacement = "".join(converted)
+        
+        self.starts[first:] = starts + [start + delta for start in self.starts[last:]]
+        self.ends[first:] = ends + [end + delta for end in self.ends[last:]]
+        self.converted[first:last] = converted
+        self.source = source
+        
+        if self.track_methods:
+            self.symbols[first:last] = symbols
+            methods = resolve_methods(self.symbols)
+            if methods != self.methods:
+                # A struct or grouped signature changed, which can touch any declaration
+                previous_end = len(self.header) + sum(len(text) for text in self.converted)
+                previous_end += output_end - output_start - len(replacement)
+                self.methods = methods
+                self.rules = get_rules(self.from_lang, self.to_lang, methods,
+                                       strip_comments=self.strip_comments)
+                self.converted = [self.convert_segment(segment)
+                                  for segment in iter_segments(iter_tokens(source))]
+                return len(self.header), previous_end, "".join(self.converted)
+        return output_start, output_end, replacement
@@ -0,0 +1,286 @@
+import re
+import sys
+from array import array
+from collections import namedtuple
+
+from convert_hub.profiling import StageTimer
+
+Token = namedtuple("Token", "kind text start")
+
+COMMENT = "comment"
+PREPROCESSOR = "preprocessor"
+STRING = "string"
+CHAR = "char"
+NUMBER = "number"
+IDENTIFIER = "identifier"
+NEWLINE = "newline"
+WHITESPACE = "whitespace"
+PUNCT = "punct"
+
+# Tokens that never change the meaning of the code around them
+TRIVIA = (WHITESPACE, NEWLINE, COMMENT)
+
+# Blocks whose members are split into separate declarations instead of being kept whole
+CONTAINER_KEYWORDS = ("namespace", "class", "interface")
+
+# One alternation tried left to right at every position; the final "." makes sure every
+# character of the source ends up in exactly one token, so joining the texts round-trips
+TOKEN_PATTERN = re.compile(r"""
+    (?P<comment>//[^\n]*|/\*.*?(?:\*/|\Z))
+  | (?P<preprocessor>^[ \t]*\#(?:[^\n\\]|\\.)*)
+  | (?P<string>
+        R"(?P<delim>[^(\s]{0,16})\(.*?(?:\)(?P=delim)"|\Z)   # C++ raw string
+      | \$?@\$?"(?:[^"]|"")*"?                               # C# verbatim string
+      | (?:u8|[uUL])?\$?"(?:[^"\\\n]|\\.)*"?)                # regular / interpolated string
+  | (?P<char>(?:u8|[uUL])?'(?:[^'\\\n]|\\.)*'?)
+  | (?P<number>\.?\d(?:[eEpP][+-]|[\w.'])*)
+  | (?P<identifier>[A-Za-z_]\w*)
+  | (?P<newline>\r?\n)
+  | (?P<whitespace>[ \t\f\v\r]+)
+  | (?P<punct>::|->|\+\+|--|<<=?|>>=?|&&|\|\||[-+*/%&|^!=<>]=|.)
+""", re.VERBOSE | re.MULTILINE | re.DOTALL)
+
+# Token kinds by the number of their group in TOKEN_PATTERN, which is what TokenArray
+# stores ("delim" is a group inside raw strings, never the kind of a token)
+KINDS = (None,) + tuple(sorted(TOKEN_PATTERN.groupindex, key=TOKEN_PATTERN.groupindex.get))
+KIND_CODES = TOKEN_PATTERN.groupindex
+
+IDENTIFIER_CODE = KIND_CODES[IDENTIFIER]
+PREPROCESSOR_CODE = KIND_CODES[PREPROCESSOR]
+COMMENT_CODE = KIND_CODES[COMMENT]
+WHITESPACE_CODE = KIND_CODES[WHITESPACE]
+NEWLINE_CODE = KIND_CODES[NEWLINE]
+
+# How far past the start of a token TOKEN_PATTERN may look without reaching the end of
+# it, with room to spare: a raw string's opening R"delim( is at most 19 characters
+CUT_MARGIN = 32
+
+
+class TokenArray:
+    # Tokens of one text as two arrays: the kind code of every token and its start
+    # offset, with the end of the last token appended. Tokens tile the text, so each
+    # one's end is the next one's start, and a token costs 9 bytes instead of a tuple, a
+    # string and an int the garbage collector has to track. Offsets are absolute;
+    # source holds the text from offset origin on. Indexing and iteration build Token
+    # tuples on demand, with identifier texts interned so held tokens share them.
+    __slots__ = ("source", "origin", "kinds", "starts")
+    
+    def __init__(self, source, origin, kinds, starts):
+        self.source = source
+        self.origin = origin
+        self.kinds = kinds
+        self.starts = starts
+    
+    @classmethod
+    def from_tokens(cls, tokens):
+        # tokens must follow each other in the text, as iter_tokens and iter_segments
+        # yield them
+        origin = tokens[0].start if tokens else 0
+        source = "".join(token.text for token in tokens)
+        starts = array('q', [token.start for token in tokens])
+        starts.append(origin + len(source))
+        return cls(source, origin, array('B', [KIND_CODES[token.kind] for token in tokens]),
+                   starts)
+    
+    def __len__(self):
+        return len(self.kinds)
+    
+    def text(self, index):
+        origin = self.origin
+        text = self.source[self.starts[index] - origin:self.starts[index + 1] - origin]
+        return sys.intern(text) if self.kinds[index] == IDENTIFIER_CODE else text
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self.kinds))
+            if step != 1:
+                raise ValueError("TokenArray slices cannot have a step")
+            stop = max(start, stop)
+            return TokenArray(self.source, self.origin, self.kinds[start:stop],
+                              self.starts[start:stop + 1])
+        kind = self.kinds[index]
+        if index < 0:
+            index += len(self.kinds)
+        return Token(KINDS[kind], self.text(index), self.starts[index])
+    
+    def __iter__(self):
+        source = self.source
+        origin = self.origin
+        starts = self.starts
+        for index, kind in enumerate(self.kinds):
+            start = starts[index]
+            text = source[start - origin:starts[index + 1] - origin]
+            if kind == IDENTIFIER_CODE:
+                text = sys.intern(text)
+            yield Token(KINDS[kind], text, start)
+    
+    def __add__(self, other):
+        # Joins the tokens of two adjacent stretches of text, like those of consecutive
+        # windows of iter_token_windows
+        if not self.kinds:
+            return other
+        if not other.kinds:
+            return self
+        if self.starts[-1] != other.starts[0]:
+            raise ValueError("TokenArrays to join must be adjacent")
+        source = (self.source[self.starts[0] - self.origin:self.starts[-1] - self.origin]
+                  + other.source[other.starts[0] - other.origin:
+                                 other.starts[-1] - other.origin])
+        return TokenArray(source, self.starts[0], self.kinds + other.kinds,
+                          self.starts[:-1] + other.starts)
+
+
+def tokenize(source, base=0):
+    # base is added to every start offset when source is a slice of a larger text
+    kinds = array('B')
+    starts = array('q')
+    add_kind = kinds.append
+    add_start = starts.append
+    for match in TOKEN_PATTERN.finditer(source):
+        add_kind(match.lastindex)
+        add_start(base + match.start())
+    starts.append(base + len(source))
+    return TokenArray(source, base, kinds, starts)
+
+
+def iter_tokens(source, pos=0):
+    # Lazily tokenizes source from pos; unlike slicing, "^" still only matches at real
+    # line starts, so tokens come out exactly as they would from position 0
+    for match in TOKEN_PATTERN.finditer(source, pos):
+        yield Token(match.lastgroup, match.group(), match.start())
+
+
+def next_significant(tokens, index):
+    # Index of the first non-trivia token at or after index (len(tokens) if none)
+    while index < len(tokens) and tokens[index].kind in TRIVIA:
+        index += 1
+    return index
+
+
+class LongSegment(list):
+    # A run of the tokens of a declaration longer than iter_segments was allowed to hold
+    pass
+
+
+def iter_segments(tokens, max_tokens=None, bodies=True):
+    # Groups a token stream into top-level declarations (functions, structs, classes,
+    # prototypes, preprocessor lines). Namespace and class bodies are split into their
+    # members. Leading whitespace and comments belong to the declaration that follows.
+    # The grouping state is empty at every boundary, so re-segmenting from any boundary
+    # gives the same result as segmenting the whole text. With max_tokens, a declaration
+    # longer than that is yielded as it is read, in LongSegment runs of up to max_tokens.
+    # With bodies False, only the head of each declaration is kept: its leading trivia
+    # and the tokens between the braces of a top-level block are dropped, so a body or
+    # initializer table of any size costs no memory.
+    segment = []
+    block_depth = 0
+    function_body = has_code = has_paren = has_assign = has_container = False
+    previous = None
+    
+    for token in tokens:
+        if max_tokens and len(segment) >= max_tokens:
+            yield LongSegment(segment)
+            segment = LongSegment()
+        if bodies:
+            segment.append(token)
+        elif not block_depth and (segment or token.kind not in TRIVIA):
+            segment.append(token)
+        if token.kind in TRIVIA:
+            continue
+        text = token.text
+        
+        if block_depth:
+            if text == "{":
+                block_depth += 1
+            elif text == "}":
+                block_depth -= 1
+                if block_depth == 0 and not bodies:
+                    segment.append(token)
+                if block_depth == 0 and function_body:
+                    yield segment
+                    segment = []
+                    has_code = has_paren = has_assign = has_container = False
+            continue
+        
+        if text == ";" or text == "}" or (token.kind == PREPROCESSOR and not has_code):
+            # "}" at this level closes a namespace or class body
+            yield segment
+            segment = []
+            has_code = has_paren = has_assign = has_container = False
+        elif text == "{":
+            if has_container and not has_paren:
+                yield segment
+                segment = []
+                has_code = has_paren = has_assign = has_container = False
+            else:
+                block_depth = 1
+                function_body = has_paren and not has_assign
+        else:
+            has_code = True
+            if text == "(":
+                has_paren = True
+            elif text == "=":
+                has_assign = True
+            elif token.kind == IDENTIFIER and text in CONTAINER_KEYWORDS:
+                has_container = True
+            elif token.kind == STRING and previous == "extern":
+                has_container = True
+        previous = text
+    
+    if segment:
+        yield segment
+
+
+def find_line_cut(tokens):
+    # Index of the last token of a window cut inside a line, or -1. Tokens starting
+    # CUT_MARGIN before the end of the text are the same whatever follows it, and so is
+    # the token after the cut unless it is whitespace or "#", where "^" would now match
+    # the start of a preprocessor line.
+    source = tokens.source
+    origin = tokens.origin
+    starts = tokens.starts
+    kinds = tokens.kinds
+    limit = starts[-1] - CUT_MARGIN
+    index = len(kinds) - 1
+    while index > 0:
+        start = starts[index]
+        if start <= limit and kinds[index] != WHITESPACE_CODE and source[start - origin] != "#":
+            return index - 1
+        index -= 1
+    return -1
+
+
+def iter_token_windows(chunks, timer=None, stage="lex"):
+    # Yields TokenArrays of complete tokens. A window ends on a newline token where it can:
+    # newlines inside comments, strings or continued preprocessor lines are part of those
+    # tokens, so everything before the last newline token is tokenized exactly as it
+    # would be in the whole file. Text with no newline is cut inside the line instead
+    # (see find_line_cut), so a long line is not carried and lexed again chunk after
+    # chunk. The text after the cut is carried into the next chunk. Lexing time is
+    # recorded under stage.
+    timer = timer or StageTimer()
+    pending = ""
+    base = 0
+    for chunk in chunks:
+        pending += chunk
+        with timer.stage(stage):
+            tokens = tokenize(pending, base)
+        
+        kinds = tokens.kinds
+        cut = len(kinds) - 1
+        while cut >= 0 and kinds[cut] != NEWLINE_CODE:
+            cut -= 1
+        if cut < 0:
+            cut = find_line_cut(tokens)
+            if cut < 0:
+                continue
+        
+        consumed = tokens.starts[cut + 1] - base
+        yield tokens[:cut + 1]
+        pending = pending[consumed:]
+        base += consumed
+    
+    if pending:
+        with timer.stage(stage):
+            tokens = tokenize(pending, base)
+        yield tokens
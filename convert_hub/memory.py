@@ -0,0 +1,92 @@
+import sys
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Rough peak RSS cost of converting one source character in memory: its share of the
+# token arrays and the source, window and output text (~5 bytes traced) plus allocator
+# overhead
+BYTES_PER_SOURCE_CHAR = 16
+
+# Resident size of an idle worker process before it converts anything
+WORKER_BASELINE = 40 << 20
+
+DEFAULT_MEMORY_LIMIT = 512 << 20
+
+# Bounds for the streaming chunk size picked from a budget
+MIN_CHUNK_SIZE = 16 << 10
+MAX_CHUNK_SIZE = 1 << 20
+
+
+def read_proc_status(field):
+    # Value of a "VmXXX:  1234 kB" line in bytes, or None off Linux
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss():
+    # Linux can reset the high-water mark, which lets long-lived worker processes report
+    # the peak of each job instead of their whole lifetime
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss():
+    peak = read_proc_status("VmHWM")
+    if peak is not None:
+        return peak
+    if psutil and hasattr(psutil.Process().memory_info(), "peak_wset"):
+        return psutil.Process().memory_info().peak_wset
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def format_bytes(size):
+    if size is None:
+        return "n/a"
+    return f"{size / (1 << 20):.1f} MB"
+
+
+class MemoryBudget:
+    # A memory ceiling shared by the engine and the batch pipeline. Conversion memory
+    # grows with the amount of source held at once, so the budget is enforced by choosing
+    # how much source is held: fewer workers, smaller streaming windows, and spilling
+    # whole-buffer results to disk.
+    
+    def __init__(self, limit=DEFAULT_MEMORY_LIMIT):
+        self.limit = limit
+    
+    def fits_in_memory(self, source_chars):
+        return source_chars * BYTES_PER_SOURCE_CHAR <= self.limit
+    
+    def worker_count(self, requested):
+        # Each worker needs its baseline plus at least the smallest streaming window
+        per_worker = WORKER_BASELINE + MIN_CHUNK_SIZE * BYTES_PER_SOURCE_CHAR
+        return max(1, min(requested, self.limit // per_worker))
+    
+    def split(self, workers):
+        return MemoryBudget(self.limit // max(workers, 1))
+    
+    def chunk_size(self):
+        available = self.limit - WORKER_BASELINE
+        return max(MIN_CHUNK_SIZE, min(MAX_CHUNK_SIZE, available // BYTES_PER_SOURCE_CHAR))
+    
+    def max_pending_tokens(self):
+        # Tokens a rule may hold back; about as many as one window produces
+        return max(1000, self.chunk_size() // 2)
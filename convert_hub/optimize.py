@@ -0,0 +1,576 @@
+import re
+from bisect import bisect_left
+
+from convert_hub.engine import find_matching_brace, split_arguments
+from convert_hub.lexer import (IDENTIFIER, PREPROCESSOR, STRING, TRIVIA, LongSegment,
+                               iter_segments, iter_token_windows)
+from convert_hub.profiling import StageTimer
+
+# Operators whose left-hand side is what a statement writes to
+ASSIGN_OPERATORS = ("=", "+=", "-=", "*=", "/=", "%=", "&=", "|=", "^=", "<<=", ">>=")
+
+INCREMENTS = ("++", "--")
+
+# Tokens after which a new statement starts
+STATEMENT_STARTS = (";", "{", "}", "else")
+
+# Identifiers followed by "(" that are not function calls
+NON_CALLS = ("if", "for", "while", "switch", "return", "sizeof", "catch")
+
+LOOP_KEYWORDS = ("for", "foreach", "while", "do")
+
+# Calls that never write to the strings passed to them
+PURE_FUNCTIONS = ("strlen", "strcmp", "strncmp", "toupper", "tolower", "isalpha", "isdigit",
+                  "isalnum", "isspace", "isupper", "islower", "isprint", "ispunct", "abs",
+                  "printf", "putchar", "puts")
+
+# Integer types a for loop variable may be declared with for strlen hoisting
+INTEGER_WORDS = ("int", "unsigned", "signed", "long", "short", "size_t", "std", "::")
+
+# Functions that only read their arguments from the given index on, so a char buffer
+# that became a std::string is passed to them as .c_str()
+READ_ARGUMENTS = {
+    "printf": 0,
+    "fprintf": 1,
+    "sprintf": 1,
+    "snprintf": 2,
+    "puts": 0,
+    "fputs": 0,
+    "strcmp": 0,
+    "strncmp": 0,
+    "strcpy": 1,
+    "strncpy": 1,
+    "strcat": 1,
+    "atoi": 0,
+    "atol": 0,
+    "atof": 0,
+}
+
+# printf conversions that std::string concatenation can reproduce exactly
+FORMAT_PATTERN = re.compile(r"%(%|l{0,2}[diu]|f|s|c|)")
+
+# Operands that need no parentheses to take part in a + chain: names, member accesses
+# and string literals
+SIMPLE_EXPRESSION_PATTERN = re.compile(r'^(?:\w+(?:(?:\.|->)\w+)*|"(?:[^"\\]|\\.)*")$')
+
+CSTRING_INCLUDE_PATTERN = re.compile(r"^[ \t]*#[ \t]*include[ \t]*<cstring>[ \t]*$")
+
+# Tokens of a declaration held for the passes; a longer one, typically a generated table,
+# is passed through unoptimized so memory stays bounded
+MAX_OPTIMIZE_TOKENS = 100000
+
+
+def code_indices(tokens):
+    return [i for i, token in enumerate(tokens) if token.kind not in TRIVIA]
+
+
+def find_matching(tokens, code, position):
+    # Code position of the bracket closing the one at code position position, else None
+    index = find_matching_brace(tokens, code[position])
+    return None if index is None else bisect_left(code, index)
+
+
+def find_block(texts, position):
+    # Code position of the "{" opening the block around position (None at the top level)
+    depth = 0
+    for p in range(position - 1, -1, -1):
+        if texts[p] == "}":
+            depth += 1
+        elif texts[p] == "{":
+            if not depth:
+                return p
+            depth -= 1
+    return None
+
+
+def in_function_body(texts, position):
+    # Whether position is inside a function body rather than a struct or an initializer
+    outer = None
+    block = find_block(texts, position)
+    while block is not None:
+        outer = block
+        block = find_block(texts, block)
+    return outer is not None and texts[outer - 1] in (")", "const")
+
+
+def find_semicolon(texts, start, end):
+    # Position of the first ";" outside brackets in texts[start:end], else None
+    depth = 0
+    for p in range(start, end):
+        if texts[p] in ("(", "[", "{"):
+            depth += 1
+        elif texts[p] in (")", "]", "}"):
+            depth -= 1
+        elif texts[p] == ";" and not depth:
+            return p
+    return None
+
+
+def enclosing_call(texts, kinds, position):
+    # (name_position, open_position, argument_index) of the call position is a whole
+    # argument of, else None
+    if texts[position - 1] not in ("(", ",") or texts[position + 1] not in (",", ")"):
+        return None
+    depth = 0
+    commas = 0
+    for p in range(position - 1, -1, -1):
+        text = texts[p]
+        if text in (")", "]"):
+            depth += 1
+        elif text in ("(", "["):
+            if depth:
+                depth -= 1
+            elif text == "(" and p and kinds[p - 1] == IDENTIFIER:
+                return p - 1, p, commas
+            else:
+                return None
+        elif text in (";", "{", "}"):
+            return None
+        elif text == "," and not depth:
+            commas += 1
+    return None
+
+
+def call_start(texts, name_position):
+    # Includes a std:: qualifier in the call
+    if name_position >= 2 and texts[name_position - 1] == "::" and \
+            texts[name_position - 2] == "std":
+        return name_position - 2
+    return name_position
+
+
+def blank(edits, tokens_range):
+    for index in tokens_range:
+        edits[index] = ""
+
+
+def may_write(texts, kinds, start, end, name):
+    # Whether code[start:end] may change name or the characters it points to: any call
+    # outside PURE_FUNCTIONS, or any write to something other than a plain local variable
+    for p in range(start, end):
+        text = texts[p]
+        if kinds[p] == IDENTIFIER:
+            if texts[p + 1] == "(" and text not in PURE_FUNCTIONS and text not in NON_CALLS:
+                return True
+        elif text in ASSIGN_OPERATORS:
+            target = texts[p - 1]
+            before = texts[p - 2] if p >= 2 else ";"
+            if kinds[p - 1] != IDENTIFIER or target == name or before in (".", "->", "::"):
+                return True
+            if before == "*" and kinds[p - 3] != IDENTIFIER:
+                return True
+        elif text in INCREMENTS:
+            if kinds[p - 1] == IDENTIFIER or texts[p - 1] in (")", "]"):
+                target, before, after = p - 1, p - 2, p
+            else:
+                target, before, after = p + 1, p - 1, p + 1
+            if kinds[target] != IDENTIFIER or texts[target] == name:
+                return True
+            if texts[before] in (".", "->", "*") or texts[after + 1] in (".", "->", "[", "("):
+                return True
+    return False
+
+
+def hoist_strlen(tokens, code, texts, kinds, edits):
+    # for (int i = 0; i < strlen(s); i++)
+    #   ->  for (int i = 0, s_len = strlen(s); i < s_len; i++)
+    # when nothing in the condition, step or body can change s, so the length is only
+    # computed once instead of on every iteration
+    if "strlen" not in texts:
+        return
+    names = {text for text, kind in zip(texts, kinds) if kind == IDENTIFIER}
+    
+    for p, text in enumerate(texts):
+        if text != "for" or kinds[p] != IDENTIFIER or texts[p + 1] != "(":
+            continue
+        close = find_matching(tokens, code, p + 1)
+        if close is None:
+            continue
+        semicolons = []
+        depth = 0
+        for q in range(p + 2, close):
+            if texts[q] in ("(", "[", "{"):
+                depth += 1
+            elif texts[q] in (")", "]", "}"):
+                depth -= 1
+            elif texts[q] == ";" and not depth:
+                semicolons.append(q)
+        if len(semicolons) != 2:
+            continue
+        first_semi, second_semi = semicolons
+        
+        # The loop variable must be a single integer declaration the length can join
+        q = p + 2
+        while texts[q] in INTEGER_WORDS:
+            q += 1
+        if q == p + 2 or kinds[q] != IDENTIFIER or texts[q + 1] != "=" or \
+                q + 2 >= first_semi or "," in texts[q + 2:first_semi]:
+            continue
+        last_init = code[first_semi - 1]
+        if last_init in edits:
+            continue
+        
+        if texts[close + 1] == "{":
+            body_end = find_matching(tokens, code, close + 1)
+        else:
+            body_end = find_semicolon(texts, close + 1, len(code))
+            if body_end is not None and "{" in texts[close + 1:body_end]:
+                body_end = None
+        if body_end is None or texts[body_end + 1] == "else":
+            continue
+        
+        calls = {}
+        for q in range(first_semi + 1, second_semi - 3):
+            if texts[q] == "strlen" and texts[q + 1] == "(" and kinds[q + 2] == IDENTIFIER \
+                    and texts[q + 3] == ")" and texts[q - 1] not in (".", "->"):
+                calls.setdefault(texts[q + 2], []).append((call_start(texts, q), q + 3))
+        
+        declarations = []
+        for name, spans in calls.items():
+            if may_write(texts, kinds, first_semi + 1, body_end + 1, name):
+                continue
+            touched = [code[r] for start, end in spans for r in range(start, end + 1)]
+            if any(index in edits for index in touched):
+                continue
+            
+            length = f"{name}_len"
+            suffix = 2
+            while length in names:
+                length = f"{name}_len{suffix}"
+                suffix += 1
+            names.add(length)
+            
+            start, end = spans[0]
+            call = "".join(token.text for token in tokens[code[start]:code[end] + 1])
+            declarations.append(f", {length} = {call}")
+            for start, end in spans:
+                blank(edits, range(code[start], code[end] + 1))
+                edits[code[start]] = length
+        
+        if declarations:
+            edits[last_init] = tokens[last_init].text + "".join(declarations)
+
+
+def format_concatenation(literal, arguments):
+    # "id=%d %s" with (n, name) -> std::string("id=") + std::to_string(n) + " " + name,
+    # or None when the format uses anything std::string cannot reproduce
+    body = literal[1:-1]
+    pieces = []
+    position = 0
+    used = 0
+    for match in FORMAT_PATTERN.finditer(body):
+        conversion = match.group(1)
+        if not conversion:
+            return None
+        text = body[position:match.start()]
+        position = match.end()
+        if conversion == "%":
+            pieces.append(("text", text + "%"))
+            continue
+        if text:
+            pieces.append(("text", text))
+        if used >= len(arguments):
+            return None
+        argument = arguments[used]
+        used += 1
+        if conversion == "s":
+            if not SIMPLE_EXPRESSION_PATTERN.match(argument):
+                argument = f"({argument})"
+            pieces.append(("string", argument))
+        elif conversion == "c":
+            pieces.append(("std", f"std::string(1, {argument})"))
+        else:
+            pieces.append(("std", f"std::to_string({argument})"))
+    if body[position:]:
+        pieces.append(("text", body[position:]))
+    if used != len(arguments) or not pieces:
+        return None
+    
+    # Adjacent literal pieces are merged back into one literal
+    merged = []
+    for kind, text in pieces:
+        if kind == "text" and merged and merged[-1][0] == "text":
+            merged[-1] = ("text", merged[-1][1] + text)
+        else:
+            merged.append((kind, text))
+    
+    parts = []
+    for kind, text in merged:
+        if kind == "text":
+            text = f'"{text}"'
+        if kind != "std" and not parts and len(merged) > 1:
+            text = f"std::string({text})"
+        parts.append(text)
+    return " + ".join(parts)
+
+
+def std_string_edits(tokens, code, texts, kinds, declaration):
+    # Edits that turn the char buffer declared at code position declaration into a
+    # std::string, or None when one of its uses has no std::string equivalent
+    name = texts[declaration + 1]
+    close = declaration + 3
+    while close < len(code) and texts[close] != "]":
+        close += 1
+    if close >= len(code):
+        return None
+    if texts[close + 1] == "=":
+        if kinds[close + 2] != STRING or texts[close + 3] != ";":
+            return None
+    elif texts[close + 1] != ";":
+        return None
+    
+    block = find_block(texts, declaration)
+    if block is None or not in_function_body(texts, declaration):
+        return None
+    block_end = find_matching(tokens, code, block)
+    if block_end is None:
+        return None
+    
+    edits = {code[declaration]: "std::string"}
+    blank(edits, range(code[declaration + 1] + 1, code[close] + 1))
+    
+    for p in range(len(code)):
+        if texts[p] != name or kinds[p] != IDENTIFIER or p == declaration + 1 or \
+                texts[p - 1] in (".", "->", "::"):
+            continue
+        if not close < p < block_end:
+            return None
+        
+        if texts[p + 1] == "[":
+            end = p + 1
+            depth = 0
+            for end in range(p + 1, block_end):
+                if texts[end] == "[":
+                    depth += 1
+                elif texts[end] == "]":
+                    depth -= 1
+                    if not depth:
+                        break
+            if texts[end + 1] in ASSIGN_OPERATORS or texts[end + 1] in INCREMENTS or \
+                    texts[p - 1] in ("&",) + INCREMENTS:
+                return None
+            continue
+        
+        call = enclosing_call(texts, kinds, p)
+        if call is None:
+            return None
+        function, open_paren, argument = call
+        start = call_start(texts, function)
+        if texts[start - 1] in (".", "->"):
+            return None
+        close_paren = find_matching(tokens, code, open_paren)
+        if close_paren is None:
+            return None
+        statement = texts[start - 1] in STATEMENT_STARTS and texts[close_paren + 1] == ";"
+        head = range(code[start], code[p + 2])
+        
+        if argument == 0 and statement and texts[function] in ("strcpy", "strcat") and \
+                texts[p + 1] == ",":
+            # strcpy(name, value); -> name = value;   strcat(name, value); -> name += value;
+            blank(edits, head)
+            operator = "=" if texts[function] == "strcpy" else "+="
+            edits[code[start]] = f"{name} {operator} "
+            edits[code[close_paren]] = ""
+        elif argument == 0 and statement and texts[function] == "sprintf":
+            arguments = split_arguments(tokens, code[open_paren], code[close_paren])
+            values = ["".join(token.text for token in tokens[first:last]).strip()
+                      for first, last in arguments[1:]]
+            if not values or name in values:
+                return None
+            literal = [token for token in tokens[arguments[1][0]:arguments[1][1]]
+                       if token.kind not in TRIVIA]
+            if len(literal) != 1 or literal[0].kind != STRING or \
+                    not literal[0].text.startswith('"'):
+                return None
+            expression = format_concatenation(literal[0].text, values[1:])
+            if expression is None:
+                return None
+            blank(edits, range(code[start], code[close_paren] + 1))
+            edits[code[start]] = f"{name} = {expression}"
+        elif argument == 0 and texts[function] == "strlen":
+            blank(edits, range(code[start], code[close_paren] + 1))
+            edits[code[start]] = f"{name}.size()"
+        elif argument >= READ_ARGUMENTS.get(texts[function], len(code)):
+            edits[code[p]] = f"{name}.c_str()"
+        else:
+            return None
+    return edits
+
+
+def use_std_string(tokens, code, texts, kinds, edits):
+    # Local char buffers filled with strcpy/strcat/sprintf become std::string, which
+    # cannot overflow and knows its length
+    if "char" not in texts:
+        return
+    for p, text in enumerate(texts):
+        if text == "char" and p and texts[p - 1] in STATEMENT_STARTS and \
+                kinds[p + 1] == IDENTIFIER and texts[p + 2] == "[":
+            buffer_edits = std_string_edits(tokens, code, texts, kinds, p)
+            if buffer_edits and not buffer_edits.keys() & edits.keys():
+                edits.update(buffer_edits)
+
+
+def add_string_header(tokens, code, texts, kinds, edits):
+    # std::string needs <string>; a file using the C string functions includes <cstring>
+    if PREPROCESSOR not in kinds:
+        return
+    for index in code:
+        token = tokens[index]
+        if token.kind == PREPROCESSOR and index not in edits and \
+                CSTRING_INCLUDE_PATTERN.match(token.text):
+            edits[index] = token.text + "\n#include <string>"
+
+
+def string_builder_edits(tokens, code, texts, kinds, declaration):
+    # Edits that turn the string declared at code position declaration into a
+    # StringBuilder, or None unless it is only appended to in a loop and otherwise read
+    name = texts[declaration + 1]
+    semicolon = find_semicolon(texts, declaration + 3, len(code))
+    block = find_block(texts, declaration)
+    if semicolon is None or semicolon == declaration + 3 or block is None or \
+            "," in texts[declaration + 3:semicolon] or not in_function_body(texts, declaration):
+        return None
+    block_end = find_matching(tokens, code, block)
+    if block_end is None:
+        return None
+    
+    edits = {
+        code[declaration]: "var",
+        code[declaration + 2]: "= new System.Text.StringBuilder(",
+        code[semicolon]: ");",
+    }
+    blank(edits, range(code[declaration + 2] + 1, code[declaration + 3]))
+    
+    looped = False
+    for p in range(len(code)):
+        if texts[p] != name or kinds[p] != IDENTIFIER or p == declaration + 1 or \
+                texts[p - 1] in (".", "->", "::"):
+            continue
+        if not semicolon < p < block_end or texts[p - 1] in ("ref", "out") + INCREMENTS:
+            return None
+        
+        following = texts[p + 1]
+        if following == "+=" and texts[p - 1] in STATEMENT_STARTS:
+            # name += value;  ->  name.Append(value);
+            end = find_semicolon(texts, p + 2, block_end)
+            if end is None or end == p + 2:
+                return None
+            blank(edits, range(code[p] + 1, code[p + 2]))
+            edits[code[p + 1]] = ".Append("
+            edits[code[end]] = ");"
+            nested = find_block(texts, p)
+            looped = looped or (nested != block and
+                                any(text in LOOP_KEYWORDS for text in texts[semicolon:p]))
+        elif following in ASSIGN_OPERATORS or following in INCREMENTS:
+            return None
+        elif following == "." and texts[p + 2] == "Length":
+            continue
+        else:
+            edits[code[p]] = f"{name}.ToString()"
+    return edits if looped else None
+
+
+def use_string_builder(tokens, code, texts, kinds, edits):
+    # Strings built up with += in a loop copy everything appended so far on every
+    # iteration; a StringBuilder appends in place
+    if "+=" not in texts:
+        return
+    for p, text in enumerate(texts):
+        if text == "string" and p and texts[p - 1] in STATEMENT_STARTS and \
+                kinds[p + 1] == IDENTIFIER and texts[p + 2] == "=":
+            builder_edits = string_builder_edits(tokens, code, texts, kinds, p)
+            if builder_edits and not builder_edits.keys() & edits.keys():
+                edits.update(builder_edits)
+
+
+# Passes run over every converted declaration, per target language and in order.
+# Changing these changes conversion output: bump ENGINE_VERSION along with them.
+OPTIMIZATIONS = {
+    "C": (hoist_strlen,),
+    "C++": (add_string_header, use_std_string, hoist_strlen),
+    "C#": (use_string_builder,),
+}
+
+
+def optimize_segment(tokens, passes, line_map=None):
+    # Passes see the significant tokens of the declaration as code (indices into tokens)
+    # and their texts and kinds, padded so they can look two tokens past the end
+    code = code_indices(tokens)
+    texts = [tokens[i].text for i in code] + [";", ";"]
+    kinds = [tokens[i].kind for i in code] + [None, None]
+    edits = {}
+    for optimization in passes:
+        optimization(tokens, code, texts, kinds, edits)
+    if not edits:
+        text = "".join(token.text for token in tokens)
+        if line_map is not None:
+            line_map.copied(text)
+        return text
+    if line_map is not None:
+        map_edits(tokens, edits, line_map)
+    return "".join(edits.get(i, token.text) for i, token in enumerate(tokens))
+
+
+def map_edits(tokens, edits, line_map):
+    # Tells line_map about the unchanged runs and the replaced tokens of a segment
+    run = []
+    for i, token in enumerate(tokens):
+        if i in edits:
+            line_map.copied("".join(run))
+            line_map.replaced(token.text, edits[i])
+            run = []
+        else:
+            run.append(token.text)
+    line_map.copied("".join(run))
+
+
+def iter_optimize(texts, to_lang, timer=None, line_map=None):
+    # Post-conversion stage: re-lexes converted text and yields it optimized one top-level
+    # declaration at a time. Every pass stays inside its declaration, so the output does
+    # not depend on how the text was chunked. Declarations over MAX_OPTIMIZE_TOKENS are
+    # left as they are. line_map maps optimized lines to converted ones.
+    timer = timer or StageTimer()
+    passes = OPTIMIZATIONS.get(to_lang)
+    if not passes:
+        for text in texts:
+            if line_map is not None:
+                line_map.copied(text)
+            yield text
+        return
+    
+    windows = iter_token_windows(texts, timer, "optimize")
+    for segment in iter_segments((token for window in windows for token in window),
+                                 MAX_OPTIMIZE_TOKENS):
+        with timer.stage("optimize"):
+            if isinstance(segment, LongSegment):
+                text = "".join(token.text for token in segment)
+                if line_map is not None:
+                    line_map.copied(text)
+            else:
+                text = optimize_segment(segment, passes, line_map)
+        yield text
+
+
+def iter_optimize_progress(parts, to_lang, timer=None):
+    # iter_optimize over (text, tokens_done, total_tokens) parts; declarations are
+    # coalesced back into one part per part read
+    progress = [0, 0]
+    
+    def texts():
+        for text, done, total in parts:
+            progress[:] = done, total
+            yield text
+    
+    pending = []
+    reported = None
+    for text in iter_optimize(texts(), to_lang, timer):
+        pending.append(text)
+        if progress != reported:
+            reported = list(progress)
+            yield "".join(pending), progress[0], progress[1]
+            pending = []
+    yield "".join(pending), progress[1], progress[1]
+
+
+def optimize_source(text, to_lang, timer=None):
+    return "".join(iter_optimize([text], to_lang, timer))
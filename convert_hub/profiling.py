@@ -0,0 +1,86 @@
+import cProfile
+import json
+import os
+import time
+from contextlib import contextmanager
+
+
+class StageTimer:
+    # Accumulates wall time per named stage. Stages can be entered many times (once per
+    # chunk when streaming); their durations add up.
+    
+    def __init__(self):
+        self.stages = {}
+    
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+    
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+    
+    def merge(self, stages):
+        for name, seconds in stages.items():
+            self.add(name, seconds)
+    
+    @property
+    def total(self):
+        return sum(self.stages.values())
+    
+    def summary(self):
+        return ", ".join(f"{name} {format_seconds(seconds)}"
+                         for name, seconds in self.stages.items())
+
+
+def format_seconds(seconds):
+    if seconds < 1:
+        return f"{seconds * 1000:.1f}ms"
+    return f"{seconds:.2f}s"
+
+
+@contextmanager
+def profile_to(path):
+    # Runs the block under cProfile and dumps the stats to path (nothing when path is None)
+    if not path:
+        yield
+        return
+    
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        profiler.dump_stats(path)
+
+
+class TraceLog:
+    # Structured batch log, one JSON object per line, so runs can be grepped, loaded
+    # into a dataframe or diffed without parsing free-form text
+    
+    def __init__(self, path):
+        self.path = path
+        # The log often goes into an output folder the run has not created yet
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, 'w', encoding='utf-8')
+        self._start = time.perf_counter()
+    
+    def write(self, event, **fields):
+        record = {"event": event, "time": round(time.perf_counter() - self._start, 6)}
+        record.update(fields)
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+    
+    def close(self):
+        self._file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
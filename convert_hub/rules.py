@@ -0,0 +1,222 @@
+import hashlib
+import json
+import os
+import tempfile
+
+from convert_hub.lexer import IDENTIFIER, TRIVIA, tokenize
+
+# Declarative API mappings per language pair. A pattern is a run of significant tokens
+# starting with an identifier (whitespace and comments between them are ignored); the
+# whole run is replaced with the mapped text. No pattern may be a prefix of another one
+# for the same pair, so a match never has to look further than its own tokens.
+# Changing these changes conversion output: bump ENGINE_VERSION along with them.
+API_MAPPINGS = {
+    ("C", "C++"): {
+        "NULL": "nullptr",
+        "printf (": "std::printf(",
+        "fprintf (": "std::fprintf(",
+        "sprintf (": "std::sprintf(",
+        "snprintf (": "std::snprintf(",
+        "puts (": "std::puts(",
+        "malloc (": "std::malloc(",
+        "calloc (": "std::calloc(",
+        "realloc (": "std::realloc(",
+        "free (": "std::free(",
+        "exit (": "std::exit(",
+        "strlen (": "std::strlen(",
+        "strcpy (": "std::strcpy(",
+        "strncpy (": "std::strncpy(",
+        "strcmp (": "std::strcmp(",
+        "strcat (": "std::strcat(",
+        "memcpy (": "std::memcpy(",
+        "memset (": "std::memset(",
+        "sqrt (": "std::sqrt(",
+        "pow (": "std::pow(",
+        "fabs (": "std::fabs(",
+    },
+    ("C++", "C"): {
+        "nullptr": "NULL",
+        "std :: printf": "printf",
+        "std :: fprintf": "fprintf",
+        "std :: sprintf": "sprintf",
+        "std :: snprintf": "snprintf",
+        "std :: puts": "puts",
+        "std :: malloc": "malloc",
+        "std :: calloc": "calloc",
+        "std :: realloc": "realloc",
+        "std :: free": "free",
+        "std :: exit": "exit",
+        "std :: strlen": "strlen",
+        "std :: strcpy": "strcpy",
+        "std :: strncpy": "strncpy",
+        "std :: strcmp": "strcmp",
+        "std :: strcat": "strcat",
+        "std :: memcpy": "memcpy",
+        "std :: memset": "memset",
+        "std :: sqrt": "sqrt",
+        "std :: pow": "pow",
+        "std :: fabs": "fabs",
+    },
+    ("C#", "C++"): {
+        "null": "nullptr",
+        "string": "std::string",
+        "Console . WriteLine": "std::cout <<",
+        "Console . Write": "std::cout <<",
+        "Math . Sqrt": "std::sqrt",
+        "Math . Pow": "std::pow",
+        "Math . Abs": "std::abs",
+        "Math . Max": "std::max",
+        "Math . Min": "std::min",
+    },
+    ("C++", "C#"): {
+        "nullptr": "null",
+        "std :: string": "string",
+        "std :: sqrt": "Math.Sqrt",
+        "std :: pow": "Math.Pow",
+        "std :: abs": "Math.Abs",
+        "std :: max": "Math.Max",
+        "std :: min": "Math.Min",
+    },
+    ("C", "C#"): {
+        "NULL": "null",
+        "sqrt (": "Math.Sqrt(",
+        "pow (": "Math.Pow(",
+        "fabs (": "Math.Abs(",
+    },
+    ("C#", "C"): {
+        "null": "NULL",
+        "Math . Sqrt": "sqrt",
+        "Math . Pow": "pow",
+        "Math . Abs": "fabs",
+    },
+}
+
+# #include <header> rewrites per language pair
+HEADER_MAPPINGS = {
+    ("C", "C++"): {
+        "assert.h": "cassert",
+        "ctype.h": "cctype",
+        "limits.h": "climits",
+        "math.h": "cmath",
+        "stddef.h": "cstddef",
+        "stdint.h": "cstdint",
+        "stdio.h": "cstdio",
+        "stdlib.h": "cstdlib",
+        "string.h": "cstring",
+        "time.h": "ctime",
+    },
+    ("C++", "C"): {
+        "cassert": "assert.h",
+        "cctype": "ctype.h",
+        "climits": "limits.h",
+        "cmath": "math.h",
+        "cstddef": "stddef.h",
+        "cstdint": "stdint.h",
+        "cstdio": "stdio.h",
+        "cstdlib": "stdlib.h",
+        "cstring": "string.h",
+        "ctime": "time.h",
+    },
+}
+
+# Key of the replacement in a trie node; token texts are never empty
+MATCH = ""
+
+RULES_FILENAME = "rules.json"
+
+
+def pair_name(from_lang, to_lang):
+    return f"{from_lang}>{to_lang}"
+
+
+def pattern_tokens(pattern):
+    tokens = [token for token in tokenize(pattern) if token.kind not in TRIVIA]
+    if not tokens or tokens[0].kind != IDENTIFIER:
+        raise ValueError(f"Mapping pattern must start with an identifier: {pattern!r}")
+    return [token.text for token in tokens]
+
+
+def compile_mappings(mappings):
+    # Merges the patterns of one pair into a trie of token texts, so matching costs one
+    # dict lookup per token however many mappings there are
+    trie = {}
+    for pattern, replacement in mappings.items():
+        node = trie
+        for text in pattern_tokens(pattern):
+            if MATCH in node:
+                raise ValueError(f"Mapping pattern extends a shorter one: {pattern!r}")
+            node = node.setdefault(text, {})
+        if node:
+            raise ValueError(f"Mapping pattern is a prefix of a longer one: {pattern!r}")
+        node[MATCH] = replacement
+    return trie
+
+
+def compile_tables():
+    tables = {}
+    for from_lang, to_lang in API_MAPPINGS.keys() | HEADER_MAPPINGS.keys():
+        tables[pair_name(from_lang, to_lang)] = {
+            "tokens": compile_mappings(API_MAPPINGS.get((from_lang, to_lang), {})),
+            "headers": HEADER_MAPPINGS.get((from_lang, to_lang), {}),
+        }
+    return tables
+
+
+def mappings_digest():
+    # Identifies the declarative tables a compiled file was built from
+    declared = [[pair_name(*pair), API_MAPPINGS.get(pair, {}), HEADER_MAPPINGS.get(pair, {})]
+                for pair in sorted(API_MAPPINGS.keys() | HEADER_MAPPINGS.keys())]
+    return hashlib.sha256(json.dumps(declared, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def load_tables(path):
+    digest = mappings_digest()
+    try:
+        with open(path, encoding="utf-8") as file:
+            stored = json.load(file)
+        if stored.get("digest") == digest:
+            return stored["tables"]
+    except (OSError, ValueError, KeyError, AttributeError):
+        pass
+    
+    tables = compile_tables()
+    try:
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Write then rename, so concurrent workers never read a partial file
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding="utf-8") as file:
+                json.dump({"digest": digest, "tables": tables}, file)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+    except OSError:
+        # A read-only cache location only costs a recompile next time
+        pass
+    return tables
+
+
+_tables = None
+# Cache directory the compiled tables are kept in between runs; None (caching off) keeps
+# them in memory only
+_tables_dir = None
+
+
+def set_rules_dir(directory):
+    # Takes effect for tables not compiled yet in this process
+    global _tables_dir
+    _tables_dir = directory
+
+
+def get_rule_table(from_lang, to_lang):
+    # Compiled once per process and reused across runs from the cache directory.
+    # Returns {"tokens": trie, "headers": {header: replacement}} for the pair.
+    global _tables
+    if _tables is None:
+        if _tables_dir:
+            _tables = load_tables(os.path.join(_tables_dir, RULES_FILENAME))
+        else:
+            _tables = compile_tables()
+    return _tables.get(pair_name(from_lang, to_lang), {"tokens": {}, "headers": {}})
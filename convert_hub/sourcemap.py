@@ -0,0 +1,107 @@
+import json
+import os
+from array import array
+
+from convert_hub.fileio import atomic_output
+
+# Written next to a converted file, e.g. out.cpp.map
+SOURCE_MAP_SUFFIX = ".map"
+
+BASE64_DIGITS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+
+
+def encode_vlq(value):
+    # Base64 VLQ as used by source map mappings: sign in the lowest bit, then 5 bits per
+    # digit with a continuation bit
+    value = (-value << 1) | 1 if value < 0 else value << 1
+    digits = []
+    while True:
+        digit = value & 31
+        value >>= 5
+        digits.append(BASE64_DIGITS[digit | 32 if value else digit])
+        if not value:
+            return "".join(digits)
+
+
+class LineMap:
+    # The source line (from 0) each output line starts on, -1 for generated lines such as
+    # the header. Built in the same pass that writes the output: copied text advances
+    # source and output line for line, and a replacement maps its lines onto the lines of
+    # the text it replaced. With through, the LineMap of an earlier stage whose output
+    # is this stage's input, lines are mapped on to that stage's source.
+    __slots__ = ("lines", "source_line", "open", "through")
+    
+    def __init__(self, through=None):
+        self.lines = array('i')
+        self.source_line = 0
+        # True while the current output line has no text, and so no source line, yet
+        self.open = True
+        self.through = through
+    
+    def copied(self, text):
+        breaks = text.count("\n")
+        self.emit(text, self.source_line, breaks)
+        self.source_line += breaks
+    
+    def replaced(self, source_text, text):
+        breaks = source_text.count("\n")
+        self.emit(text, self.source_line, breaks)
+        self.source_line += breaks
+    
+    def generated(self, text):
+        self.emit(text, -1, 0)
+    
+    def emit(self, text, line, spans):
+        # Output text that starts on source line and covers spans source line breaks;
+        # output lines past the last of those stay on it
+        if not text:
+            return
+        if self.open:
+            self.lines.append(self.map_line(line))
+        self.open = text.endswith("\n")
+        started = text.count("\n") - self.open
+        if not started:
+            return
+        if line < 0:
+            self.lines.extend(array('i', [-1]) * started)
+            return
+        last = line + min(started, spans)
+        if self.through is None:
+            self.lines.extend(range(line + 1, last + 1))
+        else:
+            self.lines.extend(self.through.lines[line + 1:last + 1])
+        self.lines.extend(array('i', [self.map_line(last)]) * (started - (last - line)))
+    
+    def map_line(self, line):
+        if self.through is None or line < 0:
+            return line
+        return self.through.lines[line]
+    
+    def mappings(self):
+        # The "mappings" of a version 3 source map: one segment per output line, from its
+        # first column to the start of its source line. Generated lines have none.
+        segments = []
+        previous = 0
+        for line in self.lines:
+            if line < 0:
+                segments.append("")
+            else:
+                segments.append(f"AA{encode_vlq(line - previous)}A")
+                previous = line
+        return ";".join(segments)
+
+
+def write_source_map(map_path, source_path, output_path, mappings):
+    # mappings is kept apart from the paths so cached mappings can be written for any
+    # location. Paths in the map are relative to it, as tools resolve them.
+    directory = os.path.dirname(os.path.abspath(map_path))
+    source = os.path.relpath(os.path.abspath(source_path), directory)
+    source_map = {
+        "version": 3,
+        "file": os.path.basename(output_path),
+        "sources": [source.replace(os.sep, "/")],
+        "names": [],
+        "mappings": mappings,
+    }
+    with atomic_output(map_path) as file:
+        json.dump(source_map, file)
@@ -0,0 +1,144 @@
+import os
+
+from convert_hub.engine import conversion_header, get_rules, rewrite_tokens
+from convert_hub.fileio import atomic_output
+from convert_hub.lexer import NEWLINE_CODE, iter_token_windows
+from convert_hub.optimize import iter_optimize
+from convert_hub.profiling import StageTimer
+from convert_hub.sourcemap import LineMap
+
+# Characters read from the input per step
+STREAM_CHUNK_SIZE = 1 << 20
+
+# Files larger than this are converted file-to-file instead of through the editor
+STREAM_THRESHOLD = 8 << 20
+
+# Characters of a streamed file shown in the editors
+PREVIEW_SIZE = 64 << 10
+
+# Tokens a rule may hold back while waiting for the rest of its construct; past this the
+# rule is run as if the input had ended so memory stays bounded
+MAX_PENDING_TOKENS = 200000
+
+# Rewritten tokens kept in front of the next window for rules that look back from their
+# trigger: at most a whitespace token and the member access before it
+LOOKBEHIND_TOKENS = 2
+
+
+def read_chunks(file, chunk_size=STREAM_CHUNK_SIZE, timer=None):
+    timer = timer or StageTimer()
+    while True:
+        with timer.stage("read"):
+            chunk = file.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_string_chunks(source, chunk_size=STREAM_CHUNK_SIZE):
+    for start in range(0, len(source), chunk_size):
+        yield source[start:start + chunk_size]
+
+
+def iter_stream_conversion(chunks, from_lang, to_lang, options,
+                           max_pending=MAX_PENDING_TOKENS, timer=None, methods=None,
+                           includes=None, line_map=None):
+    # Generator pipeline: chunks -> token windows -> rewritten text [-> optimized text].
+    # Only the current window, the tokens a rule is still waiting on and the declaration
+    # being optimized are held in memory. line_map, a LineMap, gets the source line of
+    # every output line as the text is yielded.
+    timer = timer or StageTimer()
+    header = conversion_header(from_lang, to_lang, options)
+    if line_map is not None:
+        line_map.generated(header)
+    yield header
+    
+    optimize = options.get("optimize_code")
+    rewrite_map = line_map
+    if optimize and line_map is not None:
+        # The optimizer maps its lines onto rewritten ones, which this maps to the source
+        rewrite_map = LineMap()
+        line_map.through = rewrite_map
+    texts = iter_stream_rewrite(chunks, from_lang, to_lang, max_pending, timer, methods,
+                                includes, not options["preserve_comments"], rewrite_map)
+    if optimize:
+        texts = iter_optimize(texts, to_lang, timer, line_map)
+    yield from texts
+
+
+def iter_stream_rewrite(chunks, from_lang, to_lang, max_pending, timer, methods, includes,
+                        strip_comments=False, line_map=None):
+    rules = get_rules(from_lang, to_lang, methods, includes, strip_comments)
+    # carried[:begin] are tokens already rewritten, kept for rules to look back at
+    carried = []
+    begin = 0
+    edits = {}
+    for window in iter_token_windows(chunks, timer):
+        tokens = carried + window if carried else window
+        final = len(carried) - begin > max_pending
+        end = len(tokens)
+        if not final and tokens.kinds[-1] != NEWLINE_CODE:
+            # The window was cut inside a line, so its last token is left for the next
+            # round, where rules before it can see what follows it
+            end -= 1
+        with timer.stage("rewrite"):
+            text, stop = rewrite_tokens(tokens, rules, edits, begin, end, final, line_map)
+        yield text
+        
+        # Edits are keyed by position, so shift the ones made ahead of stop along with
+        # the tokens that are carried over
+        keep = max(0, stop - LOOKBEHIND_TOKENS)
+        carried = tokens[keep:]
+        begin = stop - keep
+        edits = {index - keep: edit for index, edit in edits.items()}
+    
+    if len(carried) > begin:
+        with timer.stage("rewrite"):
+            text, _ = rewrite_tokens(carried, rules, edits, begin, len(carried), True,
+                                     line_map)
+        yield text
+
+
+def convert_stream(input_file, output_file, from_lang, to_lang, options, on_chunk=None,
+                   budget=None, timer=None, methods=None, includes=None, line_map=None):
+    # Converts between two open text files and returns the number of source lines.
+    # on_chunk(chunk) is called for every chunk read, e.g. to report progress. A
+    # MemoryBudget shrinks the window and lookahead to fit; a StageTimer collects
+    # read/lex/rewrite/write timings; a LineMap collects the source map.
+    timer = timer or StageTimer()
+    chunk_size = budget.chunk_size() if budget else STREAM_CHUNK_SIZE
+    max_pending = budget.max_pending_tokens() if budget else MAX_PENDING_TOKENS
+    lines = 0
+    
+    def counted_chunks():
+        nonlocal lines
+        for chunk in read_chunks(input_file, chunk_size, timer):
+            lines += chunk.count("\n")
+            if on_chunk:
+                on_chunk(chunk)
+            yield chunk
+    
+    for text in iter_stream_conversion(counted_chunks(), from_lang, to_lang, options,
+                                       max_pending, timer, methods, includes, line_map):
+        with timer.stage("write"):
+            output_file.write(text)
+    return lines + 1
+
+
+def convert_file_streaming(source_path, output_path, from_lang, to_lang, options,
+                           on_progress=None, budget=None, timer=None, methods=None):
+    # on_progress(bytes_read, total_bytes) is called after every chunk
+    total = os.path.getsize(source_path)
+    
+    with open(source_path, 'r', encoding='utf-8') as input_file, \
+            atomic_output(output_path) as output_file:
+        def report(chunk):
+            on_progress(min(input_file.buffer.tell(), total), total)
+        
+        return convert_stream(input_file, output_file, from_lang, to_lang, options,
+                              report if on_progress else None, budget, timer, methods)
+
+
+def read_preview(path, size=PREVIEW_SIZE):
+    with open(path, 'r', encoding='utf-8') as file:
+        return file.read(size)
@@ -0,0 +1,300 @@
+import hashlib
+import json
+import os
+import tempfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from convert_hub.engine import (METHOD_PAIRS, find_matching_brace, parse_pointer_param,
+                                split_arguments)
+from convert_hub.lexer import (COMMENT, IDENTIFIER, PREPROCESSOR, TRIVIA, iter_segments,
+                               iter_token_windows, iter_tokens)
+from convert_hub.streaming import read_chunks
+
+# What a free function becomes when convert_oo groups it into a struct: a method of
+# class_name, const when the struct pointer was to const, with the remaining parameters
+Method = namedtuple("Method", "class_name const returns params")
+
+# Bump when the per-file symbols change shape, so stale index files are rebuilt
+INDEX_VERSION = 2
+
+INDEX_DIRNAME = "symbols"
+
+# Files rescanned per task handed to a worker process
+SCAN_CHUNK_FILES = 16
+
+# An identifier between these tokens is used as a value (a callback argument, an
+# assignment, &name) rather than called; a function used that way keeps its free name
+VALUE_BEFORE = frozenset(("(", ",", "=", "&", "==", "!=", "return", "?", ":", "{", ")"))
+VALUE_AFTER = frozenset((",", ")", ";", "}", ":"))
+
+
+def wants_methods(from_lang, to_lang, options):
+    return options.get("convert_oo") and (from_lang, to_lang) in METHOD_PAIRS
+
+
+def new_symbols():
+    return {"structs": [], "typedefs": {}, "functions": [], "references": []}
+
+
+def declaration_text(segment, first, last):
+    # Source text from token first to token last with comments dropped and whitespace
+    # (including line breaks) collapsed to single spaces
+    texts = [token.text for token in segment
+             if first.start <= token.start <= last.start and token.kind != COMMENT]
+    return " ".join("".join(texts).split())
+
+
+def scan_typedef(code, symbols):
+    texts = [token.text for token in code]
+    if texts[1] != "struct":
+        # typedef Type Alias;
+        if len(code) == 4 and code[1].kind == IDENTIFIER and code[2].kind == IDENTIFIER:
+            symbols["typedefs"][texts[2]] = texts[1]
+        return
+    
+    tag = texts[2] if len(code) > 2 and code[2].kind == IDENTIFIER else None
+    if "{" not in texts:
+        # typedef struct Tag Alias;
+        if tag and len(code) == 5 and code[3].kind == IDENTIFIER:
+            symbols["typedefs"][texts[3]] = tag
+        return
+    
+    close = find_matching_brace(code, texts.index("{"))
+    alias = None
+    if close is not None and close + 1 < len(code) and code[close + 1].kind == IDENTIFIER:
+        alias = texts[close + 1]
+    name = tag or alias
+    if name:
+        symbols["structs"].append(name)
+        if alias and alias != name:
+            symbols["typedefs"][alias] = name
+
+
+def scan_function(segment, code, symbols):
+    # [static] return-type name(params) followed by a body or ";"
+    for paren, token in enumerate(code):
+        if token.text == "(":
+            break
+        if token.kind != IDENTIFIER and token.text not in ("*", "&"):
+            return
+    else:
+        return
+    if paren < 2 or code[paren - 1].kind != IDENTIFIER:
+        return
+    close = find_matching_brace(code, paren)
+    if close is None or close + 1 >= len(code) or code[close + 1].text not in ("{", ";"):
+        return
+    
+    prefix = [token.text for token in code[:paren - 1]]
+    function = {
+        "name": code[paren - 1].text,
+        "static": "static" in prefix,
+        "definition": code[close + 1].text == "{",
+    }
+    arguments = split_arguments(code, paren, close)
+    param = arguments and parse_pointer_param([token.text for token in
+                                               code[arguments[0][0]:arguments[0][1]]])
+    if param:
+        first = 1 if prefix[0] == "extern" else 0
+        function["type"] = param[0]
+        function["const"] = param[1]
+        function["returns"] = declaration_text(segment, code[first], code[paren - 2])
+        function["params"] = ""
+        if len(arguments) > 1:
+            function["params"] = declaration_text(segment, code[arguments[1][0]],
+                                                  code[close - 1])
+    symbols["functions"].append(function)
+
+
+def scan_declaration(segment, symbols):
+    code = [token for token in segment if token.kind not in TRIVIA]
+    if len(code) < 3 or code[0].kind == PREPROCESSOR:
+        return
+    if code[0].text == "typedef":
+        scan_typedef(code, symbols)
+    elif code[0].text == "struct" and code[1].kind == IDENTIFIER and code[2].text == "{":
+        symbols["structs"].append(code[1].text)
+    else:
+        scan_function(segment, code, symbols)
+
+
+def iter_references(tokens, references):
+    # Passes tokens through, adding each identifier used as a value to references. Runs
+    # ahead of the segmenter, which drops function bodies.
+    previous = None
+    candidate = None
+    for token in tokens:
+        yield token
+        kind = token.kind
+        if kind in TRIVIA:
+            continue
+        text = token.text
+        if candidate is not None:
+            if text in VALUE_AFTER:
+                references.add(candidate)
+            candidate = None
+        if kind == IDENTIFIER and previous in VALUE_BEFORE:
+            candidate = text
+        previous = text
+
+
+def scan_tokens(tokens):
+    # Structs, typedefs and free functions declared at the top level of a token stream,
+    # plus the names it uses as values. Declarations are grouped without their bodies.
+    symbols = new_symbols()
+    references = set()
+    for segment in iter_segments(iter_references(tokens, references), bodies=False):
+        scan_declaration(segment, symbols)
+    symbols["references"] = sorted(references)
+    return symbols
+
+
+def scan_source(source):
+    return scan_tokens(iter_tokens(source))
+
+
+def scan_file(path):
+    # Streamed, so scanning a project holds one declaration at a time
+    with open(path, 'r', encoding='utf-8') as file:
+        return scan_tokens(token for window in iter_token_windows(read_chunks(file))
+                           for token in window)
+
+
+def resolve_type(name, typedefs):
+    seen = set()
+    while name in typedefs and name not in seen:
+        seen.add(name)
+        name = typedefs[name]
+    return name
+
+
+def resolve_methods(symbol_sets):
+    # Groups every function defined once, not static, never used as a value, and taking a
+    # pointer to a known struct first into that struct. Returns {function_name: Method}.
+    structs = set()
+    typedefs = {}
+    definitions = {}
+    excluded = {"main"}
+    for symbols in symbol_sets:
+        structs.update(symbols["structs"])
+        typedefs.update(symbols["typedefs"])
+        excluded.update(symbols["references"])
+        for function in symbols["functions"]:
+            name = function["name"]
+            if function["static"] or (function["definition"] and name in definitions):
+                excluded.add(name)
+            elif function["definition"]:
+                definitions[name] = function
+    
+    methods = {}
+    for name, function in definitions.items():
+        if name in excluded or name in structs or "type" not in function:
+            continue
+        class_name = resolve_type(function["type"], typedefs)
+        if class_name in structs:
+            methods[name] = Method(class_name, function["const"], function["returns"],
+                                   function["params"])
+    return methods
+
+
+def methods_digest(methods):
+    # Goes into cache keys: output depends on the methods of the whole project
+    encoded = json.dumps(sorted(methods.items()), separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def scan_files(paths):
+    # A file that cannot be read contributes no symbols; converting it reports the error
+    scanned = []
+    for path in paths:
+        try:
+            scanned.append(scan_file(path))
+        except (OSError, ValueError):
+            scanned.append(new_symbols())
+    return scanned
+
+
+def get_index_path(cache_dir, source_root):
+    digest = hashlib.sha256(os.path.realpath(source_root).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, INDEX_DIRNAME, digest[:16] + ".json")
+
+
+class SymbolIndex:
+    # Symbols per file of a project. update() rescans only files whose mtime or size
+    # changed since the last run; with a path the index is kept on disk between runs.
+    
+    def __init__(self, path=None):
+        self.path = path
+        self.files = {}
+        if path:
+            self.load()
+    
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                stored = json.load(file)
+            if stored.get("version") == INDEX_VERSION:
+                self.files = stored["files"]
+        except (OSError, ValueError, KeyError, AttributeError):
+            self.files = {}
+    
+    def save(self):
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        # Write then rename, so a concurrent run never reads a partial index
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            # dumps encodes in C, json.dump streaming to the file would not
+            with os.fdopen(fd, 'w', encoding="utf-8") as file:
+                file.write(json.dumps({"version": INDEX_VERSION, "files": self.files}))
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+    
+    def update(self, paths, workers=1, changed=None):
+        # Returns the number of files that were (re)scanned. Files that are gone drop out.
+        # changed, when given, holds every path that may have changed; the rest are taken
+        # as indexed without a stat.
+        files = {}
+        stale = []
+        for path in paths:
+            path = os.path.abspath(path)
+            if changed is not None and path not in changed and path in self.files:
+                files[path] = self.files[path]
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Deleted since it was listed; it drops out like any other missing file
+                continue
+            stamp = [stat.st_mtime_ns, stat.st_size]
+            entry = self.files.get(path)
+            if entry is not None and entry["stamp"] == stamp:
+                files[path] = entry
+            else:
+                stale.append((path, stamp))
+        
+        names = [path for path, _ in stale]
+        if workers > 1 and len(stale) > SCAN_CHUNK_FILES:
+            groups = [names[i:i + SCAN_CHUNK_FILES]
+                      for i in range(0, len(names), SCAN_CHUNK_FILES)]
+            with ProcessPoolExecutor(max_workers=min(workers, len(groups))) as executor:
+                scanned = [symbols for group in executor.map(scan_files, groups)
+                           for symbols in group]
+        else:
+            scanned = scan_files(names)
+        
+        for (path, stamp), symbols in zip(stale, scanned):
+            symbols["stamp"] = stamp
+            files[path] = symbols
+        
+        changed = len(stale) + len(self.files.keys() - files.keys())
+        self.files = files
+        if self.path and changed:
+            self.save()
+        return len(stale)
+    
+    def methods(self):
+        return resolve_methods(self.files[path] for path in sorted(self.files))
@@ -0,0 +1,395 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from convert_hub.cache import DEFAULT_CACHE_SIZE, get_cache
+from convert_hub.fileio import write_text
+from convert_hub.includes import IncludeGraph
+
+# Bump when checks change in a way that makes cached results stale
+VERIFY_VERSION = 2
+
+# Language each converted file is checked as, by extension
+OUTPUT_LANGUAGES = {
+    ".c": "C",
+    ".h": "C",
+    ".cpp": "C++",
+    ".hpp": "C++",
+    ".cs": "C#",
+}
+
+# A check still running after this many seconds fails
+CHECK_TIMEOUT = 120
+
+# Compiler output kept per failed file
+MAX_MESSAGE_LINES = 20
+
+# file(line,column): error CS0246: ... as mcs and csc print diagnostics, naming the file
+# as it was given on the command line
+DIAGNOSTIC_PATTERN = re.compile(r"^(.+?)\(\d+,\d+\): (error|warning) ")
+
+PASSED = "passed"
+FAILED = "failed"
+# No compiler for the file's language is installed
+SKIPPED = "skipped"
+
+
+class Checker:
+    # A compiler run on one file at a time, or with together on every file of its
+    # language at once, as C# needs for types declared in other files of the tree. A file
+    # passes when the compiler exits with 0 or reports no error naming it. flags go into
+    # cache keys, so they must not name anything that varies between runs. With output,
+    # the compiler is given a throwaway file to write.
+    
+    def __init__(self, name, version, command, flags, output=None, include_flag=None,
+                 together=False):
+        self.name = name
+        self.version = version
+        self.command = command
+        self.flags = flags
+        self.output = output
+        self.include_flag = include_flag
+        self.together = together
+    
+    def args(self, names, include_dirs, temp_dir):
+        args = self.command + self.flags
+        if self.include_flag:
+            args = args + [self.include_flag + directory for directory in include_dirs]
+        if self.output:
+            args = args + [self.output + os.path.join(temp_dir, "check.out")]
+        return args + names
+    
+    def identity(self):
+        return [VERIFY_VERSION, self.name, self.version, self.flags]
+
+
+def run_version(args):
+    # First line a compiler prints about its version, or None when it cannot be run
+    try:
+        completed = subprocess.run(args, capture_output=True, text=True, timeout=30)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    lines = (completed.stdout or completed.stderr).strip().splitlines()
+    return lines[0] if completed.returncode == 0 and lines else None
+
+
+def find_gcc(language):
+    name = "gcc" if language == "C" else "g++"
+    path = shutil.which(name)
+    version = path and run_version([path, "-dumpfullversion"])
+    if not version:
+        return None
+    if language == "C":
+        flags = ["-fsyntax-only", "-x", "c", "-std=gnu11"]
+    else:
+        flags = ["-fsyntax-only", "-x", "c++", "-std=gnu++17"]
+    return Checker(name, version, [path], flags + [f"-fmax-errors={MAX_MESSAGE_LINES}"],
+                   include_flag="-iquote")
+
+
+def find_dotnet():
+    path = shutil.which("dotnet")
+    if path:
+        return os.path.realpath(path)
+    root = os.environ.get("DOTNET_ROOT") or os.path.join(os.path.expanduser("~"), ".dotnet")
+    path = os.path.join(root, "dotnet")
+    return path if os.access(path, os.X_OK) else None
+
+
+def newest_version(directory):
+    # Name of the subdirectory with the highest dotted version number, or None
+    try:
+        names = [name for name in os.listdir(directory) if name[:1].isdigit()]
+    except OSError:
+        return None
+    key = lambda name: [int(part) if part.isdigit() else 0
+                        for part in name.split("-")[0].split(".")]
+    return max(names, key=key) if names else None
+
+
+def find_csharp():
+    # Mono's mcs when installed, else the C# compiler that ships with the .NET SDK run
+    # against the newest reference assemblies. Both compile the files into a library
+    # they throw away, the closest either has to a syntax-only check.
+    path = shutil.which("mcs")
+    version = path and run_version([path, "--version"])
+    if version:
+        return Checker("mcs", version, [path], ["-target:library"], output="-out:",
+                       together=True)
+    
+    dotnet = find_dotnet()
+    if not dotnet:
+        return None
+    root = os.path.dirname(dotnet)
+    sdk = newest_version(os.path.join(root, "sdk"))
+    csc = sdk and os.path.join(root, "sdk", sdk, "Roslyn", "bincore", "csc.dll")
+    packs = os.path.join(root, "packs", "Microsoft.NETCore.App.Ref")
+    pack = newest_version(packs)
+    if not csc or not os.path.exists(csc) or not pack:
+        return None
+    ref_root = os.path.join(packs, pack, "ref")
+    framework = newest_version(ref_root) or max(os.listdir(ref_root), default="")
+    ref_dir = os.path.join(ref_root, framework)
+    references = sorted(name for name in os.listdir(ref_dir) if name.endswith(".dll"))
+    if not references:
+        return None
+    # References are named by file only in the flags, so keys survive a moved SDK
+    return Checker("csc", f"{sdk} ({framework} {pack})", [dotnet, "exec", csc],
+                   ["-nologo", "-noconfig", "-nostdlib+", "-target:library",
+                    f"-lib:{ref_dir}"] + [f"-r:{name}" for name in references],
+                   output="-out:", together=True)
+
+
+def find_checkers(languages):
+    # {language: Checker or None} for the given languages
+    checkers = {}
+    for language in languages:
+        if language in ("C", "C++"):
+            checkers[language] = find_gcc(language)
+        elif language == "C#":
+            checkers[language] = find_csharp()
+        else:
+            checkers[language] = None
+    return checkers
+
+
+class FileCheck:
+    # The outcome of checking one file. elapsed is the time this run spent on it, next to
+    # nothing when the result came from the cache.
+    
+    def __init__(self, path, language, checker, status, elapsed, cached=False, messages=""):
+        self.path = path
+        self.language = language
+        self.checker = checker
+        self.status = status
+        self.elapsed = elapsed
+        self.cached = cached
+        self.messages = messages
+    
+    def to_dict(self):
+        return {"file": self.path, "language": self.language, "checker": self.checker,
+                "status": self.status, "elapsed": self.elapsed, "cached": self.cached,
+                "messages": self.messages}
+
+
+class VerifyReport:
+    def __init__(self):
+        self.files = []
+        self.elapsed = 0.0
+        self.cancelled = False
+        # {language: "name version"} of the compilers used, None where none was found
+        self.checkers = {}
+    
+    def count(self, status):
+        return sum(1 for check in self.files if check.status == status)
+    
+    @property
+    def passed(self):
+        return self.count(PASSED)
+    
+    @property
+    def failed(self):
+        return self.count(FAILED)
+    
+    @property
+    def skipped(self):
+        return self.count(SKIPPED)
+    
+    @property
+    def cached(self):
+        return sum(1 for check in self.files if check.cached)
+    
+    def summary(self):
+        return (f"{self.passed} passed, {self.failed} failed, {self.skipped} skipped "
+                f"({self.cached} cached) in {self.elapsed:.2f}s")
+    
+    def to_dict(self):
+        return {"passed": self.passed, "failed": self.failed, "skipped": self.skipped,
+                "cached": self.cached, "elapsed": self.elapsed, "cancelled": self.cancelled,
+                "checkers": self.checkers,
+                "files": [check.to_dict() for check in self.files]}
+    
+    def write(self, path):
+        write_text(path, json.dumps(self.to_dict(), indent=2) + "\n")
+
+
+def file_digests(graph, paths):
+    # {path: key part} covering a file and every file of the tree it includes, directly
+    # or not, so a check is redone when any header it sees changes. None for a file that
+    # cannot be read.
+    contents = {}
+    
+    def content(path):
+        if path not in contents:
+            try:
+                with open(path, 'rb') as file:
+                    contents[path] = hashlib.sha256(file.read()).hexdigest()
+            except OSError:
+                contents[path] = None
+        return contents[path]
+    
+    digests = {}
+    for path in paths:
+        seen = {path}
+        pending = [path]
+        while pending:
+            for included in graph.includes.get(pending.pop(), {}).values():
+                if included not in seen:
+                    seen.add(included)
+                    pending.append(included)
+        if any(content(included) is None for included in seen):
+            digests[path] = None
+            continue
+        included = sorted(content(other) for other in seen if other != path)
+        digests[path] = content(path) + ":" + ",".join(included)
+    return digests
+
+
+def check_key(checker, files):
+    # files is [[name, digest], ...] for every file compiled in the one run
+    encoded = json.dumps(checker.identity() + [files], separators=(",", ":"))
+    return "verify-" + hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def relative_names(paths):
+    # The directory holding all of paths, and their names relative to it
+    directory = os.path.commonpath([os.path.dirname(path) for path in paths])
+    return directory, [os.path.relpath(path, directory) for path in paths]
+
+
+def trim_messages(lines):
+    if len(lines) > MAX_MESSAGE_LINES:
+        more = len(lines) - MAX_MESSAGE_LINES
+        lines = lines[:MAX_MESSAGE_LINES] + [f"... {more} more line(s)"]
+    return "\n".join(lines)
+
+
+def run_check(paths, language, checker, include_dirs):
+    # Compiles paths in one run, from the directory holding them and given their names
+    # relative to it, so the messages stay right for the same outputs anywhere else and
+    # can be cached with the results. Returns a FileCheck per path: a file fails on an
+    # error naming it, or on any failure when no error names a file. The run's time is
+    # split evenly between its files.
+    start = time.perf_counter()
+    directory, names = relative_names(paths)
+    with tempfile.TemporaryDirectory(prefix="convert-verify-") as temp_dir:
+        try:
+            completed = subprocess.run(checker.args(names, include_dirs, temp_dir),
+                                       capture_output=True, text=True, errors="replace",
+                                       timeout=CHECK_TIMEOUT, cwd=directory)
+            passed = completed.returncode == 0
+            messages = (completed.stdout + completed.stderr).strip()
+        except subprocess.TimeoutExpired:
+            passed = False
+            messages = f"{checker.name} timed out after {CHECK_TIMEOUT}s"
+    
+    lines = messages.splitlines()
+    own = {name: [] for name in names}
+    failing = set()
+    for line in lines:
+        match = DIAGNOSTIC_PATTERN.match(line)
+        name = match and os.path.normpath(match.group(1))
+        if name in own:
+            own[name].append(line)
+            if match.group(2) == "error":
+                failing.add(name)
+    if passed:
+        failing = set()
+    elif not failing:
+        failing = set(names)
+        own = {name: lines for name in names}
+    
+    elapsed = (time.perf_counter() - start) / len(paths)
+    return [FileCheck(path, language, f"{checker.name} {checker.version}",
+                      FAILED if name in failing else PASSED, elapsed,
+                      messages=trim_messages(own[name]) if name in failing else "")
+            for path, name in zip(paths, names)]
+
+
+def verify_outputs(paths, workers=1, cache_dir=None, cache_size=DEFAULT_CACHE_SIZE,
+                   on_checked=None, cancel_event=None):
+    # Compiles every converted file in paths with the compiler for its language, up to
+    # workers at once, and returns a VerifyReport in the order of paths. Files whose
+    # checker runs together are compiled in one run per language. Quoted includes
+    # resolve as they did for conversion: next to the including file, then in any
+    # directory of the tree holding a header. Results are cached by the content of the
+    # files of a run and everything they include. on_checked(check) is called from the
+    # calling thread.
+    report = VerifyReport()
+    start_time = time.perf_counter()
+    paths = [os.path.abspath(path) for path in paths]
+    languages = {path: OUTPUT_LANGUAGES.get(os.path.splitext(path)[1].lower())
+                 for path in paths}
+    checkers = find_checkers(sorted({language for language in languages.values()
+                                     if language}))
+    report.checkers = {language: checker and f"{checker.name} {checker.version}"
+                       for language, checker in checkers.items()}
+    
+    graph = IncludeGraph(paths)
+    digests = file_digests(graph, paths)
+    include_dirs = sorted({os.path.dirname(path) for path in paths
+                           if os.path.splitext(path)[1].lower() in (".h", ".hpp")})
+    cache = get_cache(cache_dir, cache_size) if cache_dir else None
+    
+    # Paths compiled in one run each: a run per file, but one per language for the files
+    # of a checker that runs together
+    groups = []
+    together = {}
+    for path in paths:
+        checker = checkers.get(languages[path])
+        if checker is None or not checker.together:
+            groups.append([path])
+        elif languages[path] in together:
+            together[languages[path]].append(path)
+        else:
+            together[languages[path]] = [path]
+            groups.append(together[languages[path]])
+    
+    def check(group):
+        # {path: FileCheck} for the paths of one run, or None once cancelled
+        language = languages[group[0]]
+        checker = checkers.get(language)
+        if checker is None:
+            return {path: FileCheck(path, language, None, SKIPPED, 0.0) for path in group}
+        if cancel_event is not None and cancel_event.is_set():
+            return None
+        key = None
+        if cache and all(digests[path] is not None for path in group):
+            _, names = relative_names(group)
+            key = check_key(checker, [[name, digests[path]]
+                                      for name, path in zip(names, group)])
+            stored = cache.get(key)
+            if stored is not None:
+                return {path: FileCheck(path, language, f"{checker.name} {checker.version}",
+                                        result["status"], 0.0, True, result["messages"])
+                        for path, result in zip(group, json.loads(stored))}
+        results = run_check(group, language, checker, include_dirs)
+        if key:
+            cache.put(key, json.dumps([{"status": result.status,
+                                        "messages": result.messages}
+                                       for result in results]))
+        return {result.path: result for result in results}
+    
+    # Compilers are processes of their own, so threads are enough to keep them all busy
+    with ThreadPoolExecutor(max_workers=max(1, workers),
+                            thread_name_prefix="convert-verify") as executor:
+        futures = {}
+        for group in groups:
+            future = executor.submit(check, group)
+            futures.update((path, future) for path in group)
+        for path in paths:
+            results = futures[path].result()
+            if results is None:
+                report.cancelled = True
+                continue
+            report.files.append(results[path])
+            if on_checked:
+                on_checked(results[path])
+    report.elapsed = time.perf_counter() - start_time
+    return report
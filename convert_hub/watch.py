@@ -0,0 +1,484 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from convert_hub.batch import (BatchResult, convert_file, find_output_clashes,
+                               find_source_files, get_include_renames, get_job,
+                               get_output_file, get_source_extensions)
+from convert_hub.cache import DEFAULT_CACHE_SIZE
+from convert_hub.detect import AUTO_DETECT, detect_file
+from convert_hub.includes import IncludeGraph
+from convert_hub.memory import MemoryBudget
+from convert_hub.sourcemap import SOURCE_MAP_SUFFIX
+from convert_hub.symbols import SymbolIndex, get_index_path, methods_digest, wants_methods
+
+# A burst of events ends once none has arrived for this long, so the several writes of
+# one save, or a save of many files at once, become a single reconversion
+SETTLE_DELAY = 0.05
+
+# ... but a steady stream of events never holds a reconversion back for longer
+MAX_SETTLE_DELAY = 0.3
+
+# How often the tree is rescanned where inotify is unavailable
+POLL_INTERVAL = 0.5
+
+# How often a watch checks whether it should stop
+STOP_INTERVAL = 0.2
+
+# inotify(7) event bits
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_EVENTS = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE |
+                IN_DELETE_SELF | IN_ONLYDIR)
+
+# struct inotify_event: wd, mask, cookie, len, then len bytes of NUL padded name
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def load_inotify():
+    # libc with its inotify calls, or None off Linux
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+def is_excluded(path, exclude):
+    return exclude is not None and os.path.realpath(path) == exclude
+
+
+class TreeWatcher:
+    # Reports the paths under root that were written, created, moved or deleted, a burst
+    # of events at a time. A reported directory means anything under it may have changed;
+    # root itself is reported when events were lost. exclude, usually the output tree
+    # when it lives inside root, is never looked at.
+    
+    def __init__(self, root, exclude=None):
+        self.root = os.path.abspath(root)
+        self.exclude = os.path.realpath(exclude) if exclude else None
+    
+    def read(self, timeout):
+        # Paths touched since the last call, waiting up to timeout for the first
+        raise NotImplementedError
+    
+    def wait(self, stop_event=None):
+        # Blocks until something changes and the burst of events settles, or until
+        # stop_event is set, in which case the result is empty
+        touched = set()
+        while not touched:
+            if stop_event is not None and stop_event.is_set():
+                return touched
+            touched = self.read(STOP_INTERVAL)
+        deadline = time.monotonic() + MAX_SETTLE_DELAY
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return touched
+            more = self.read(min(SETTLE_DELAY, remaining))
+            if not more:
+                return touched
+            touched |= more
+    
+    def close(self):
+        pass
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+class InotifyWatcher(TreeWatcher):
+    # One inotify watch per directory; directories created later are watched as they
+    # appear. Raises OSError when inotify is out of watches or instances.
+    
+    def __init__(self, root, exclude=None, libc=None):
+        super().__init__(root, exclude)
+        self.libc = libc or load_inotify()
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        # {watch descriptor: directory}
+        self.directories = {}
+        try:
+            self.watch_tree(self.root)
+        except OSError:
+            self.close()
+            raise
+    
+    def watch_tree(self, top):
+        for dirpath, dirnames, _ in os.walk(top):
+            dirnames[:] = [d for d in dirnames
+                           if not is_excluded(os.path.join(dirpath, d), self.exclude)]
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dirpath), WATCH_EVENTS)
+            if wd < 0:
+                error = ctypes.get_errno()
+                if dirpath == top or error not in (errno.ENOENT, errno.ENOTDIR):
+                    raise OSError(error, f"cannot watch {dirpath}: {os.strerror(error)}")
+                # Removed again before it could be watched
+                continue
+            self.directories[wd] = dirpath
+    
+    def read(self, timeout):
+        touched = set()
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return touched
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return touched
+        
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            
+            if mask & IN_Q_OVERFLOW:
+                touched.add(self.root)
+                continue
+            directory = self.directories.get(wd)
+            if mask & IN_IGNORED:
+                self.directories.pop(wd, None)
+                continue
+            if directory is None:
+                continue
+            path = os.path.join(directory, name) if name else directory
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                # Files may be written into it before its watch is in place, so the whole
+                # directory is reported
+                if is_excluded(path, self.exclude):
+                    continue
+                try:
+                    self.watch_tree(path)
+                except OSError:
+                    touched.add(self.root)
+            touched.add(path)
+        return touched
+    
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class PollingWatcher(TreeWatcher):
+    # Compares the mtime and size of every file under root every POLL_INTERVAL
+    
+    def __init__(self, root, exclude=None):
+        super().__init__(root, exclude)
+        self.stamps = self.scan()
+        self.next_scan = time.monotonic() + POLL_INTERVAL
+    
+    def scan(self):
+        stamps = {}
+        pending = [self.root]
+        while pending:
+            try:
+                entries = list(os.scandir(pending.pop()))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not is_excluded(entry.path, self.exclude):
+                            pending.append(entry.path)
+                    else:
+                        stat = entry.stat()
+                        stamps[entry.path] = (stat.st_mtime_ns, stat.st_size)
+                except OSError:
+                    continue
+        return stamps
+    
+    def read(self, timeout):
+        delay = self.next_scan - time.monotonic()
+        if delay > timeout:
+            time.sleep(timeout)
+            return set()
+        time.sleep(max(delay, 0))
+        stamps = self.scan()
+        self.next_scan = time.monotonic() + POLL_INTERVAL
+        touched = {path for path, stamp in stamps.items() if self.stamps.get(path) != stamp}
+        touched.update(self.stamps.keys() - stamps.keys())
+        self.stamps = stamps
+        return touched
+
+
+def watch_tree(root, exclude=None):
+    # inotify where there is one, else polling
+    libc = load_inotify()
+    if libc is not None:
+        try:
+            return InotifyWatcher(root, exclude, libc)
+        except OSError:
+            pass
+    return PollingWatcher(root, exclude)
+
+
+def same_symbols(symbols, other):
+    # Index entries declare the same things, whatever their stamps
+    if symbols is None or other is None:
+        return symbols is other
+    return {**symbols, "stamp": None} == {**other, "stamp": None}
+
+
+def is_under(path, directory):
+    return path == directory or path.startswith(directory.rstrip(os.sep) + os.sep)
+
+
+class WatchSession:
+    # Keeps an output tree converted while its source tree changes: every burst of saves
+    # reconverts only the files touched, the files whose include renames they change and,
+    # when they change the project's method map, the files that use it. Outputs of
+    # deleted sources are deleted. The include graph, symbol index and workers are kept
+    # between bursts, so a save is reconverted in well under a second on large trees.
+    # The watch starts when the session is created; run() then assumes the output tree
+    # is otherwise up to date, as after run_batch().
+    
+    def __init__(self, source_root, output_root, from_lang, to_lang, options, workers=1,
+                 cache_dir=None, cache_size=DEFAULT_CACHE_SIZE, memory_limit=None,
+                 source_maps=False):
+        self.source_root = os.path.abspath(source_root)
+        self.output_root = os.path.abspath(output_root)
+        self.from_lang = from_lang
+        self.to_lang = to_lang
+        self.options = options
+        self.cache_dir = cache_dir
+        self.cache_size = cache_size
+        self.source_maps = source_maps
+        self.extensions = get_source_extensions(from_lang)
+        # Events from an output tree nested in the source tree are not the user's saves
+        self.output_inside = not is_under(self.source_root, self.output_root)
+        
+        self.worker_limit = None
+        if memory_limit:
+            budget = MemoryBudget(memory_limit)
+            workers = budget.worker_count(workers)
+            self.worker_limit = budget.split(workers).limit
+        self.workers = workers
+        self.executor = None
+        
+        # Started first, so nothing saved while the rest is set up goes unnoticed
+        self.watcher = watch_tree(self.source_root, self.output_root)
+        
+        # {source path: output file}, {source path: language} and the rest of the tree's
+        # state as of the last burst; filled in by start()
+        self.outputs = None
+        self.clashes = {}
+        self.languages = {}
+        self.graph = None
+        self.renames = {}
+        self.index = None
+        self.methods = None
+        self.context = None
+    
+    def start(self):
+        paths = [os.path.abspath(path) for path in
+                 find_source_files(self.source_root, self.output_root, self.from_lang)]
+        self.outputs = {path: self.get_output_file(path) for path in paths}
+        self.clashes = find_output_clashes(sorted(self.outputs.items()))
+        for path in paths:
+            self.detect(path)
+        self.graph = IncludeGraph(paths)
+        self.renames = {path: self.get_include_renames(path) for path in paths}
+        self.index = SymbolIndex(get_index_path(self.cache_dir, self.source_root)
+                                 if self.cache_dir else None)
+        self.update_methods()
+        
+        if self.workers == 1:
+            self.executor = ThreadPoolExecutor(max_workers=1)
+        else:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+    
+    def get_output_file(self, path):
+        return get_output_file(path, self.source_root, self.output_root, self.to_lang)
+    
+    def get_include_renames(self, path):
+        return get_include_renames(self.graph, path, self.outputs, self.to_lang)
+    
+    def language(self, path):
+        return self.languages.get(path, self.from_lang)
+    
+    def detect(self, path):
+        if self.from_lang != AUTO_DETECT:
+            return
+        try:
+            self.languages[path] = detect_file(path).language
+        except OSError:
+            self.languages[path] = None
+    
+    def update_methods(self, touched=None):
+        # True when the method map changed. touched holds the files changed or removed
+        # since the last call; while their symbols stay the same, so does the map.
+        indexed = [path for path in self.outputs
+                   if wants_methods(self.language(path), self.to_lang, self.options)]
+        before = {path: self.index.files.get(path) for path in touched or ()}
+        if indexed:
+            self.index.update(indexed, self.workers, touched)
+        if touched is not None and all(same_symbols(symbols, self.index.files.get(path))
+                                       for path, symbols in before.items()):
+            return False
+        self.methods = (self.index.methods() or None) if indexed else None
+        context = methods_digest(self.methods) if self.methods else None
+        changed_context = context != self.context
+        self.context = context
+        return changed_context
+    
+    def run(self, on_update=None, stop_event=None):
+        # Watches until stop_event is set, calling on_update(result) with a BatchResult
+        # for every burst of changes
+        if self.outputs is None:
+            self.start()
+        while stop_event is None or not stop_event.is_set():
+            touched = self.watcher.wait(stop_event)
+            if touched:
+                try:
+                    result = self.update(touched)
+                except Exception as e:
+                    # One bad burst is reported against its files and the watch goes on;
+                    # the next event for them brings the state back in line
+                    result = BatchResult()
+                    result.failed = len(touched)
+                    result.errors = [(path, str(e)) for path in sorted(touched)]
+                if on_update and (result.converted or result.failed or result.removed):
+                    on_update(result)
+    
+    def resolve(self, touched):
+        # The source files touched paths stand for: (changed, removed)
+        changed = set()
+        removed = set()
+        for path in touched:
+            if self.output_inside and is_under(path, self.output_root):
+                continue
+            if os.path.isdir(path):
+                found = {os.path.abspath(found) for found in
+                         find_source_files(path, self.output_root, self.from_lang)}
+                changed |= found
+                removed.update(known for known in self.outputs
+                               if is_under(known, path) and known not in found)
+            elif os.path.isfile(path):
+                if os.path.splitext(path)[1].lower() in self.extensions:
+                    changed.add(path)
+            else:
+                removed.update(known for known in self.outputs if is_under(known, path))
+        return changed, removed
+    
+    def update(self, touched):
+        result = BatchResult()
+        result.workers = self.workers
+        start_time = time.perf_counter()
+        changed, removed = self.resolve(touched)
+        # A file deleted since its event is a removal, not a file to convert
+        vanished = {path for path in changed if not os.path.isfile(path)}
+        changed -= vanished
+        removed |= vanished & self.outputs.keys()
+        
+        for path in removed:
+            del self.outputs[path]
+            self.languages.pop(path, None)
+            self.renames.pop(path, None)
+            result.removed += 1
+        added = changed - self.outputs.keys()
+        for path in changed:
+            self.outputs[path] = self.get_output_file(path)
+            self.detect(path)
+        
+        # An output another source still claims is left for that source to rewrite
+        claimed = {os.path.normcase(output_file) for output_file in self.outputs.values()}
+        for path in removed:
+            output_file = self.get_output_file(path)
+            if os.path.normcase(output_file) in claimed:
+                continue
+            for stale in (output_file, output_file + SOURCE_MAP_SUFFIX):
+                if os.path.exists(stale):
+                    os.remove(stale)
+        
+        convert = set(changed)
+        if added or removed:
+            clashes = find_output_clashes(sorted(self.outputs.items()))
+            convert.update(path for path in self.clashes
+                           if path in self.outputs and path not in clashes)
+            self.clashes = clashes
+        with result.timer.stage("includes"):
+            if added or removed:
+                # Includes may now resolve to other files, and renames follow the output
+                # names of the files they resolve to; only the touched files are read again
+                self.graph = IncludeGraph(sorted(self.outputs),
+                                          {path: names for path, names
+                                           in self.graph.names.items()
+                                           if path not in changed and path in self.outputs})
+                rescanned = self.outputs
+            else:
+                self.graph.rescan(changed)
+                rescanned = changed
+            for path in rescanned:
+                renames = self.get_include_renames(path)
+                if path not in self.renames or renames != self.renames[path]:
+                    self.renames[path] = renames
+                    convert.add(path)
+        with result.timer.stage("index"):
+            if self.update_methods(changed | removed):
+                convert.update(path for path in self.outputs
+                               if wants_methods(self.language(path), self.to_lang,
+                                                self.options))
+        result.methods = len(self.methods or ())
+        
+        for path in sorted(convert & self.clashes.keys()):
+            result.failed += 1
+            result.errors.append((path, str(self.clashes[path])))
+        jobs = [get_job(path, self.outputs[path], self.language(path), self.from_lang,
+                        self.to_lang, self.options, self.methods, self.context,
+                        self.renames[path])
+                for path in self.graph.order()
+                if path in convert and path not in self.clashes]
+        futures = [(job[0], self.executor.submit(
+            convert_file, job[0], job[1], job[2], self.to_lang, self.options,
+            self.cache_dir, self.cache_size, self.worker_limit, None, job[3], job[5],
+            job[4], None, self.source_maps)) for job in jobs]
+        for source_path, future in futures:
+            try:
+                outcome = future.result()
+            except Exception as e:
+                result.failed += 1
+                result.errors.append((source_path, str(e)))
+                continue
+            result.converted += 1
+            result.cached += outcome.cached
+            result.lines += outcome.lines
+            result.timer.merge(outcome.stages)
+        result.elapsed = time.perf_counter() - start_time
+        return result
+    
+    def close(self):
+        self.watcher.close()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
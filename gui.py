@@ -0,0 +1,1215 @@
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
+                             QLabel, QPlainTextEdit, QComboBox, QCheckBox, QPushButton, 
+                             QFileDialog, QGroupBox, QProgressBar, QLineEdit, QStyleFactory,
+                             QSpinBox)
+from PyQt6.QtCore import (Qt, QPropertyAnimation, QEasingCurve, QParallelAnimationGroup,
+                          QObject, QRunnable, QThreadPool, QTimer, pyqtSignal)
+from PyQt6.QtGui import QIcon, QFont, QTextCursor, QPalette, QColor
+
+from convert_hub import get_extension, iter_conversion, get_worker_count, run_batch
+from convert_hub.incremental import IncrementalConverter
+from convert_hub.cache import get_cache, source_key, file_key
+from convert_hub.detect import AUTO_DETECT, detect_file, detect_language
+from convert_hub.fileio import atomic_output, read_text, write_text
+from convert_hub.memory import DEFAULT_MEMORY_LIMIT, MemoryBudget, format_bytes
+from convert_hub.profiling import StageTimer, profile_to
+from convert_hub.symbols import (methods_digest, resolve_methods, scan_file, scan_source,
+                                 wants_methods)
+from convert_hub.watch import WatchSession
+from convert_hub.streaming import (STREAM_THRESHOLD, convert_file_streaming,
+                                   iter_string_chunks, iter_stream_conversion, read_preview)
+
+# Delay after the last keystroke before live conversion runs
+LIVE_DEBOUNCE_MS = 300
+
+# Written next to batch output / used for per-job cProfile dumps
+TRACE_FILENAME = "c-convert-hub-trace.jsonl"
+VERIFY_REPORT_FILENAME = "c-convert-hub-verify.json"
+PROFILE_DIRNAME = "c-convert-hub-profile"
+
+# Output is handed to the target pane in pieces of about this size while converting
+RENDER_CHUNK_CHARS = 256 << 10
+
+# Characters outside the BMP take two positions in a QTextDocument
+NON_BMP_PATTERN = re.compile("[\U00010000-\U0010FFFF]")
+
+
+def document_position(text, index):
+    return index + len(NON_BMP_PATTERN.findall(text, 0, index))
+
+
+class ConversionSignals(QObject):
+    progress = pyqtSignal(int)
+    chunk = pyqtSignal(str)
+    finished = pyqtSignal(str)
+    spilled = pyqtSignal(str)
+    error = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+
+class ConversionWorker(QRunnable):
+    def __init__(self, source, from_lang, to_lang, options, cache=None, budget=None,
+                 timer=None, profile_file=None):
+        super().__init__()
+        self.source = source
+        self.from_lang = from_lang
+        self.to_lang = to_lang
+        self.options = options
+        self.cache = cache
+        self.budget = budget
+        self.timer = timer or StageTimer()
+        self.profile_file = profile_file
+        self.signals = ConversionSignals()
+        self._cancel_event = threading.Event()
+    
+    def cancel(self):
+        self._cancel_event.set()
+    
+    def run(self):
+        try:
+            with profile_to(self.profile_file):
+                # Functions are grouped into the structs declared in this buffer
+                methods = None
+                if wants_methods(self.from_lang, self.to_lang, self.options):
+                    with self.timer.stage("index"):
+                        methods = resolve_methods([scan_source(self.source)])
+                
+                key = None
+                if self.cache:
+                    with self.timer.stage("cache"):
+                        key = source_key(self.source, self.from_lang, self.to_lang,
+                                         self.options,
+                                         methods_digest(methods) if methods else None)
+                        cached = self.cache.get(key)
+                    if cached is not None:
+                        self.signals.finished.emit(cached)
+                        return
+                
+                if self.budget and not self.budget.fits_in_memory(len(self.source)):
+                    self.run_spilled(key, methods)
+                else:
+                    self.run_in_memory(key, methods)
+        except Exception as e:
+            self.signals.error.emit(str(e))
+    
+    def run_in_memory(self, key, methods):
+        parts = []
+        pending = []
+        pending_size = 0
+        last_percent = -1
+        
+        for part, done, total in iter_conversion(self.source, self.from_lang,
+                                                 self.to_lang, self.options,
+                                                 timer=self.timer, methods=methods):
+            if self._cancel_event.is_set():
+                self.signals.cancelled.emit()
+                return
+            
+            parts.append(part)
+            
+            # Output is rendered while the rest converts; pieces are coalesced so the
+            # GUI thread gets a handful of large inserts rather than one per chunk
+            pending.append(part)
+            pending_size += len(part)
+            if pending_size >= RENDER_CHUNK_CHARS:
+                self.signals.chunk.emit("".join(pending))
+                pending = []
+                pending_size = 0
+            
+            # Only emit when the visible value changes to keep the event queue short
+            percent = done * 100 // max(total, 1)
+            if percent != last_percent:
+                self.signals.progress.emit(percent)
+                last_percent = percent
+        
+        if pending:
+            self.signals.chunk.emit("".join(pending))
+        
+        with self.timer.stage("assemble"):
+            result = "".join(parts)
+        if key:
+            with self.timer.stage("cache"):
+                self.cache.put(key, result)
+        self.signals.finished.emit(result)
+    
+    def run_spilled(self, key, methods):
+        # Over budget: stream the buffer in windows and write the result to a temporary
+        # file instead of holding every token and the whole output in memory
+        chunk_size = self.budget.chunk_size()
+        chunks = iter_string_chunks(self.source, chunk_size)
+        total = max(len(self.source), 1)
+        
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', delete=False,
+                                         suffix=get_extension(self.to_lang)) as output:
+            try:
+                for done, text in enumerate(iter_stream_conversion(
+                        chunks, self.from_lang, self.to_lang, self.options,
+                        self.budget.max_pending_tokens(), self.timer, methods)):
+                    if self._cancel_event.is_set():
+                        break
+                    with self.timer.stage("write"):
+                        output.write(text)
+                    self.signals.progress.emit(min(done * chunk_size, total) * 100 // total)
+            except BaseException:
+                output.close()
+                os.remove(output.name)
+                raise
+        
+        if self._cancel_event.is_set():
+            os.remove(output.name)
+            self.signals.cancelled.emit()
+            return
+        
+        if key:
+            self.cache.put_file(key, output.name)
+        self.signals.spilled.emit(output.name)
+
+
+class ConversionCancelled(Exception):
+    pass
+
+
+class StreamConversionWorker(QRunnable):
+    def __init__(self, source_path, output_file, from_lang, to_lang, options, cache=None,
+                 budget=None, timer=None, profile_file=None):
+        super().__init__()
+        self.source_path = source_path
+        self.output_file = output_file
+        self.from_lang = from_lang
+        self.to_lang = to_lang
+        self.options = options
+        self.cache = cache
+        self.budget = budget
+        self.timer = timer or StageTimer()
+        self.profile_file = profile_file
+        self.signals = ConversionSignals()
+        self._cancel_event = threading.Event()
+    
+    def cancel(self):
+        self._cancel_event.set()
+    
+    def run(self):
+        try:
+            with profile_to(self.profile_file):
+                methods = None
+                if wants_methods(self.from_lang, self.to_lang, self.options):
+                    with self.timer.stage("index"):
+                        methods = resolve_methods([scan_file(self.source_path)])
+                
+                if self.cache:
+                    with self.timer.stage("cache"):
+                        key, _ = file_key(self.source_path, self.from_lang, self.to_lang,
+                                          self.options,
+                                          methods_digest(methods) if methods else None)
+                        hit = self.cache.get_file(key, self.output_file)
+                    if hit:
+                        self.signals.finished.emit(self.output_file)
+                        return
+                
+                convert_file_streaming(self.source_path, self.output_file, self.from_lang,
+                                       self.to_lang, self.options, self.report, self.budget,
+                                       self.timer, methods)
+                if self.cache:
+                    with self.timer.stage("cache"):
+                        self.cache.put_file(key, self.output_file)
+            self.signals.finished.emit(self.output_file)
+        except ConversionCancelled:
+            # The output is written through atomic_output, so a cancelled conversion has
+            # left whatever was at output_file as it was
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.error.emit(str(e))
+    
+    def report(self, done, total):
+        if self._cancel_event.is_set():
+            raise ConversionCancelled()
+        self.signals.progress.emit(done * 100 // max(total, 1))
+
+
+class BatchSignals(QObject):
+    progress = pyqtSignal(int)
+    file_done = pyqtSignal(str, int, int)
+    finished = pyqtSignal(object)
+    error = pyqtSignal(str)
+    cancelled = pyqtSignal()
+    # Watch mode: the batch result once watching starts, a result per burst of changes
+    # and the end of the watch
+    watching = pyqtSignal(object)
+    updated = pyqtSignal(object)
+    stopped = pyqtSignal()
+
+
+class BatchWorker(QRunnable):
+    def __init__(self, source_root, output_root, from_lang, to_lang, options, workers,
+                 cache_dir=None, memory_limit=None, trace_path=None, profile_dir=None,
+                 source_maps=False, watch=False, verify=False):
+        super().__init__()
+        self.source_root = source_root
+        self.output_root = output_root
+        self.from_lang = from_lang
+        self.to_lang = to_lang
+        self.options = options
+        self.workers = workers
+        self.cache_dir = cache_dir
+        self.memory_limit = memory_limit
+        self.trace_path = trace_path
+        self.profile_dir = profile_dir
+        self.source_maps = source_maps
+        self.watch = watch
+        self.verify = verify
+        self.signals = BatchSignals()
+        self._cancel_event = threading.Event()
+    
+    def cancel(self):
+        self._cancel_event.set()
+    
+    def run(self):
+        session = None
+        try:
+            if self.watch:
+                # Watching from before the run, so files saved during it are picked up
+                session = WatchSession(self.source_root, self.output_root, self.from_lang,
+                                       self.to_lang, self.options, self.workers,
+                                       self.cache_dir, memory_limit=self.memory_limit,
+                                       source_maps=self.source_maps)
+            result = run_batch(self.source_root, self.output_root, self.from_lang,
+                               self.to_lang, self.options, self.workers,
+                               self.report, self._cancel_event, self.cache_dir,
+                               memory_limit=self.memory_limit, trace_path=self.trace_path,
+                               profile_dir=self.profile_dir, source_maps=self.source_maps,
+                               verify=self.verify)
+            if result.verification:
+                result.verification.write(os.path.join(self.output_root,
+                                                       VERIFY_REPORT_FILENAME))
+            if result.cancelled:
+                self.signals.cancelled.emit()
+            elif session:
+                self.signals.watching.emit(result)
+                session.run(self.signals.updated.emit, self._cancel_event)
+                self.signals.stopped.emit()
+            else:
+                self.signals.finished.emit(result)
+        except Exception as e:
+            self.signals.error.emit(str(e))
+        finally:
+            if session:
+                session.close()
+    
+    def report(self, source_path, done, total, error):
+        self.signals.file_done.emit(source_path, done, total)
+        self.signals.progress.emit(done * 100 // total)
+
+
+class CodeConverterApp(QMainWindow):
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("C-Convert-Hub")
+        self.setGeometry(100, 100, 1200, 800)
+        self.setMinimumSize(1000, 700)
+        
+        # Load styles
+        self.setStyleSheet(self.load_stylesheet())
+        
+        # Central widget
+        self.central_widget = QWidget()
+        self.setCentralWidget(self.central_widget)
+        self.main_layout = QVBoxLayout(self.central_widget)
+        self.main_layout.setContentsMargins(15, 15, 15, 15)
+        self.main_layout.setSpacing(15)
+        
+        # Background conversion
+        self.thread_pool = QThreadPool.globalInstance()
+        self.worker = None
+        
+        # Shared conversion cache; conversion still works without one
+        try:
+            self.cache = get_cache()
+        except OSError:
+            self.cache = None
+        
+        # Large files are converted file-to-file; the editors only show a preview
+        self.stream_source = None
+        self.stream_output = None
+        # Temporary file holding the output of an over-budget conversion, deleted once
+        # the target pane stops showing it
+        self.spill_file = None
+        
+        # Stage timings and cProfile dump of the current single-file job
+        self.job_timer = StageTimer()
+        self.job_profile = None
+        # Characters of the running conversion already appended to the target pane
+        self.rendered_length = 0
+        
+        self.init_ui()
+        self.init_animations()
+        self.init_live_conversion()
+    
+    def load_stylesheet(self):
+        return """
+        /* Main window */
+        QMainWindow {
+            background-color: #2b2b2b;
+        }
+        
+        /* Group boxes */
+        QGroupBox {
+            border: 1px solid #444;
+            border-radius: 5px;
+            margin-top: 10px;
+            padding-top: 15px;
+            color: #bbb;
+            font-weight: bold;
+        }
+        
+        QGroupBox::title {
+            subcontrol-origin: margin;
+            left: 10px;
+            padding: 0 3px;
+        }
+        
+        /* Text edits */
+        QPlainTextEdit {
+            background-color: #1e1e1e;
+            color: #d4d4d4;
+            border: 1px solid #444;
+            border-radius: 4px;
+            padding: 5px;
+            font-family: 'Consolas', 'Courier New', monospace;
+            font-size: 12px;
+            selection-background-color: #264f78;
+        }
+        
+        /* Buttons */
+        QPushButton {
+            background-color: #3a3a3a;
+            color: #d4d4d4;
+            border: 1px solid #444;
+            border-radius: 4px;
+            padding: 7px 15px;
+            min-width: 80px;
+        }
+        
+        QPushButton:hover {
+            background-color: #4a4a4a;
+            border: 1px solid #555;
+        }
+        
+        QPushButton:pressed {
+            background-color: #2a2a2a;
+        }
+        
+        QPushButton:disabled {
+            background-color: #2a2a2a;
+            color: #777;
+        }
+        
+        /* Combo boxes */
+        QComboBox {
+            background-color: #3a3a3a;
+            color: #d4d4d4;
+            border: 1px solid #444;
+            border-radius: 4px;
+            padding: 5px;
+            min-width: 100px;
+        }
+        
+        QComboBox:hover {
+            background-color: #4a4a4a;
+        }
+        
+        QComboBox::drop-down {
+            border: none;
+        }
+        
+        /* Check boxes */
+        QCheckBox {
+            color: #d4d4d4;
+            spacing: 5px;
+        }
+        
+        QCheckBox::indicator {
+            width: 16px;
+            height: 16px;
+        }
+        
+        QCheckBox::indicator:unchecked {
+            background-color: #3a3a3a;
+            border: 1px solid #555;
+        }
+        
+        QCheckBox::indicator:checked {
+            background-color: #5050ff;
+            border: 1px solid #5050ff;
+        }
+        
+        /* Line edits */
+        QLineEdit {
+            background-color: #3a3a3a;
+            color: #d4d4d4;
+            border: 1px solid #444;
+            border-radius: 4px;
+            padding: 5px;
+        }
+        
+        /* Progress bar */
+        QProgressBar {
+            border: 1px solid #444;
+            border-radius: 4px;
+            text-align: center;
+            background-color: #2b2b2b;
+        }
+        
+        QProgressBar::chunk {
+            background-color: #5050ff;
+            width: 10px;
+        }
+        
+        /* Custom classes */
+        .TitleLabel {
+            font-size: 18px;
+            font-weight: bold;
+            color: #fff;
+            padding-bottom: 5px;
+        }
+        
+        .ConvertButton {
+            background-color: #5050ff;
+            font-weight: bold;
+        }
+        
+        .ConvertButton:hover {
+            background-color: #6060ff;
+        }
+        
+        .ConvertButton:pressed {
+            background-color: #4040ee;
+        }
+        """
+    
+    def init_ui(self):
+        # Header
+        self.header = QLabel("C-Convert-Hub: Advanced Code Converter")
+        self.header.setObjectName("header")
+        self.header.setStyleSheet("""
+            font-size: 24px;
+            font-weight: bold;
+            color: #fff;
+            padding-bottom: 10px;
+        """)
+        self.main_layout.addWidget(self.header)
+        
+        # Settings group
+        self.settings_group = QGroupBox("Conversion Settings")
+        self.settings_layout = QHBoxLayout(self.settings_group)
+        
+        # Language selection
+        self.lang_frame = QWidget()
+        self.lang_layout = QVBoxLayout(self.lang_frame)
+        self.lang_layout.setContentsMargins(0, 0, 0, 0)
+        
+        self.source_lang_label = QLabel("Source Language:")
+        self.source_lang = QComboBox()
+        self.source_lang.addItems(["C", "C++", "C#", AUTO_DETECT])
+        
+        self.target_lang_label = QLabel("Target Language:")
+        self.target_lang = QComboBox()
+        self.target_lang.addItems(["C", "C++", "C#"])
+        self.target_lang.setCurrentIndex(1)
+        
+        self.lang_layout.addWidget(self.source_lang_label)
+        self.lang_layout.addWidget(self.source_lang)
+        self.lang_layout.addSpacing(10)
+        self.lang_layout.addWidget(self.target_lang_label)
+        self.lang_layout.addWidget(self.target_lang)
+        
+        # Conversion options
+        self.options_frame = QWidget()
+        self.options_layout = QVBoxLayout(self.options_frame)
+        self.options_layout.setContentsMargins(0, 0, 0, 0)
+        
+        self.preserve_comments = QCheckBox("Preserve Comments")
+        self.preserve_comments.setChecked(True)
+        
+        self.convert_oo = QCheckBox("Convert OOP Constructs")
+        self.convert_oo.setChecked(True)
+        
+        self.optimize_code = QCheckBox("Optimize Code")
+        
+        self.include_metadata = QCheckBox("Include Conversion Metadata")
+        self.include_metadata.setChecked(True)
+        
+        # Batch conversions write a .map next to every output
+        self.source_maps = QCheckBox("Write Source Maps")
+        
+        # Batch conversions keep running, reconverting source files as they are saved
+        self.watch_source = QCheckBox("Watch Source Folder")
+        
+        # Batch conversions compile-check every output with the installed compilers
+        self.verify_outputs = QCheckBox("Verify Outputs")
+        
+        self.live_conversion = QCheckBox("Live Conversion")
+        
+        self.options_layout.addWidget(self.preserve_comments)
+        self.options_layout.addWidget(self.convert_oo)
+        self.options_layout.addWidget(self.optimize_code)
+        self.options_layout.addWidget(self.include_metadata)
+        self.options_layout.addWidget(self.source_maps)
+        self.options_layout.addWidget(self.watch_source)
+        self.options_layout.addWidget(self.verify_outputs)
+        self.options_layout.addWidget(self.live_conversion)
+        
+        # Performance options
+        self.perf_frame = QWidget()
+        self.perf_layout = QVBoxLayout(self.perf_frame)
+        self.perf_layout.setContentsMargins(0, 0, 0, 0)
+        
+        self.threading_label = QLabel("Threading:")
+        self.threading_combo = QComboBox()
+        self.threading_combo.addItems(["Single Thread", "Multi-Thread (2 cores)", "Multi-Thread (4 cores)", "Max Performance"])
+        
+        self.memory_usage = QCheckBox("Limit Memory Usage")
+        
+        self.memory_limit = QSpinBox()
+        self.memory_limit.setRange(64, 65536)
+        self.memory_limit.setSingleStep(64)
+        self.memory_limit.setSuffix(" MB")
+        self.memory_limit.setValue(DEFAULT_MEMORY_LIMIT >> 20)
+        self.memory_limit.setEnabled(False)
+        self.memory_usage.toggled.connect(self.memory_limit.setEnabled)
+        
+        self.perf_layout.addWidget(self.threading_label)
+        self.perf_layout.addWidget(self.threading_combo)
+        self.perf_layout.addWidget(self.memory_usage)
+        self.perf_layout.addWidget(self.memory_limit)
+        
+        self.profile_jobs = QCheckBox("Profile Jobs (cProfile)")
+        self.perf_layout.addWidget(self.profile_jobs)
+        
+        self.settings_layout.addWidget(self.lang_frame)
+        self.settings_layout.addWidget(self.options_frame)
+        self.settings_layout.addWidget(self.perf_frame)
+        self.main_layout.addWidget(self.settings_group)
+        
+        # Output settings
+        self.output_group = QGroupBox("Output Settings")
+        self.output_layout = QHBoxLayout(self.output_group)
+        
+        self.output_name_label = QLabel("Output Name:")
+        self.output_name = QLineEdit()
+        self.output_name.setPlaceholderText("output")
+        
+        self.output_path_label = QLabel("Output Path:")
+        self.output_path = QLineEdit()
+        self.output_path.setPlaceholderText("Select output directory...")
+        
+        self.browse_button = QPushButton("Browse...")
+        self.browse_button.clicked.connect(self.browse_output_path)
+        
+        self.output_layout.addWidget(self.output_name_label)
+        self.output_layout.addWidget(self.output_name)
+        self.output_layout.addWidget(self.output_path_label)
+        self.output_layout.addWidget(self.output_path)
+        self.output_layout.addWidget(self.browse_button)
+        self.main_layout.addWidget(self.output_group)
+        
+        # Code areas
+        self.code_frame = QWidget()
+        self.code_layout = QHBoxLayout(self.code_frame)
+        self.code_layout.setContentsMargins(0, 0, 0, 0)
+        self.code_layout.setSpacing(15)
+        
+        # Source code
+        self.source_group = QGroupBox("Source Code")
+        self.source_layout = QVBoxLayout(self.source_group)
+        
+        self.source_actions = QHBoxLayout()
+        self.load_button = QPushButton("Load File")
+        self.load_button.clicked.connect(self.load_file)
+        self.clear_source_button = QPushButton("Clear")
+        self.clear_source_button.clicked.connect(self.clear_source)
+        
+        self.source_actions.addWidget(self.load_button)
+        self.source_actions.addWidget(self.clear_source_button)
+        self.source_actions.addStretch()
+        
+        # Plain-text editors only lay out the blocks in view, so multi-megabyte files
+        # stay responsive
+        self.source_code = QPlainTextEdit()
+        self.source_code.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+        
+        self.source_layout.addLayout(self.source_actions)
+        self.source_layout.addWidget(self.source_code)
+        
+        # Conversion buttons
+        self.convert_buttons = QVBoxLayout()
+        self.convert_buttons.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        
+        self.convert_button = QPushButton("Convert →")
+        self.convert_button.setObjectName("ConvertButton")
+        self.convert_button.clicked.connect(self.convert_code)
+        
+        self.convert_all_button = QPushButton("Batch Convert")
+        self.convert_all_button.clicked.connect(self.batch_convert)
+        
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(self.cancel_conversion)
+        self.cancel_button.setEnabled(False)
+        
+        self.convert_buttons.addStretch()
+        self.convert_buttons.addWidget(self.convert_button)
+        self.convert_buttons.addWidget(self.convert_all_button)
+        self.convert_buttons.addWidget(self.cancel_button)
+        self.convert_buttons.addStretch()
+        
+        # Target code
+        self.target_group = QGroupBox("Converted Code")
+        self.target_layout = QVBoxLayout(self.target_group)
+        
+        self.target_actions = QHBoxLayout()
+        self.save_button = QPushButton("Save File")
+        self.save_button.clicked.connect(self.save_file)
+        self.clear_target_button = QPushButton("Clear")
+        self.clear_target_button.clicked.connect(self.clear_target)
+        
+        self.target_actions.addWidget(self.save_button)
+        self.target_actions.addWidget(self.clear_target_button)
+        self.target_actions.addStretch()
+        
+        self.target_code = QPlainTextEdit()
+        self.target_code.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+        self.target_code.setReadOnly(True)
+        # Read-only, so the undo stack would only hold a copy of every appended chunk
+        self.target_code.setUndoRedoEnabled(False)
+        
+        self.target_layout.addLayout(self.target_actions)
+        self.target_layout.addWidget(self.target_code)
+        
+        self.code_layout.addWidget(self.source_group)
+        self.code_layout.addLayout(self.convert_buttons)
+        self.code_layout.addWidget(self.target_group)
+        self.main_layout.addWidget(self.code_frame)
+        
+        # Status bar
+        self.status_bar = QLabel("Ready")
+        self.status_bar.setAlignment(Qt.AlignmentFlag.AlignLeft)
+        self.status_bar.setStyleSheet("color: #aaa;")
+        
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setTextVisible(False)
+        
+        self.status_layout = QHBoxLayout()
+        self.status_layout.addWidget(self.status_bar)
+        self.status_layout.addWidget(self.progress_bar)
+        self.main_layout.addLayout(self.status_layout)
+        
+        # Apply fusion style for modern look
+        self.setStyle(QStyleFactory.create("Fusion"))
+        
+        # Dark palette
+        palette = self.palette()
+        palette.setColor(QPalette.ColorRole.Window, QColor(53, 53, 53))
+        palette.setColor(QPalette.ColorRole.WindowText, Qt.GlobalColor.white)
+        palette.setColor(QPalette.ColorRole.Base, QColor(25, 25, 25))
+        palette.setColor(QPalette.ColorRole.AlternateBase, QColor(53, 53, 53))
+        palette.setColor(QPalette.ColorRole.ToolTipBase, Qt.GlobalColor.white)
+        palette.setColor(QPalette.ColorRole.ToolTipText, Qt.GlobalColor.white)
+        palette.setColor(QPalette.ColorRole.Text, Qt.GlobalColor.white)
+        palette.setColor(QPalette.ColorRole.Button, QColor(53, 53, 53))
+        palette.setColor(QPalette.ColorRole.ButtonText, Qt.GlobalColor.white)
+        palette.setColor(QPalette.ColorRole.BrightText, Qt.GlobalColor.red)
+        palette.setColor(QPalette.ColorRole.Link, QColor(42, 130, 218))
+        palette.setColor(QPalette.ColorRole.Highlight, QColor(42, 130, 218))
+        palette.setColor(QPalette.ColorRole.HighlightedText, Qt.GlobalColor.black)
+        self.setPalette(palette)
+    
+    def init_animations(self):
+        # Button hover animations
+        self.convert_anim = QPropertyAnimation(self.convert_button, b"geometry")
+        self.convert_anim.setDuration(200)
+        self.convert_anim.setEasingCurve(QEasingCurve.Type.OutQuad)
+        
+        # Status bar animations
+        self.status_anim = QPropertyAnimation(self.status_bar, b"styleSheet")
+        self.status_anim.setDuration(500)
+        
+        # Group box animations
+        self.group_anim_group = QParallelAnimationGroup()
+        
+        for group in [self.settings_group, self.output_group, self.source_group, self.target_group]:
+            anim = QPropertyAnimation(group, b"maximumHeight")
+            anim.setDuration(300)
+            anim.setEasingCurve(QEasingCurve.Type.InOutQuad)
+            self.group_anim_group.addAnimation(anim)
+    
+    def init_live_conversion(self):
+        self.live_converter = None
+        
+        # Restarted on every keystroke so bursts of typing convert once
+        self.live_timer = QTimer(self)
+        self.live_timer.setSingleShot(True)
+        self.live_timer.setInterval(LIVE_DEBOUNCE_MS)
+        self.live_timer.timeout.connect(self.run_live_conversion)
+        
+        self.source_code.textChanged.connect(self.schedule_live_conversion)
+        self.live_conversion.toggled.connect(self.reset_live_conversion)
+        for combo in (self.source_lang, self.target_lang):
+            combo.currentIndexChanged.connect(self.reset_live_conversion)
+        for checkbox in (self.preserve_comments, self.convert_oo, self.optimize_code,
+                         self.include_metadata):
+            checkbox.toggled.connect(self.reset_live_conversion)
+    
+    def schedule_live_conversion(self):
+        if self.live_conversion.isChecked() and not self.stream_source:
+            self.live_timer.start()
+    
+    def reset_live_conversion(self):
+        # Settings changed, so the next live run rebuilds the whole output
+        self.live_converter = None
+        self.schedule_live_conversion()
+    
+    def run_live_conversion(self):
+        if self.worker is not None or not self.live_conversion.isChecked():
+            return
+        
+        source = self.source_code.toPlainText()
+        try:
+            if self.live_converter is None:
+                self.live_converter = IncrementalConverter(self.get_source_language(source),
+                                                           self.target_lang.currentText(),
+                                                           self.get_options())
+                self.live_converter.update(source)
+                self.set_stream_output(None)
+                self.target_code.setPlainText(self.live_converter.output)
+                return
+            
+            previous = self.live_converter.output
+            patch = self.live_converter.update(source)
+            if patch is None:
+                return
+            
+            # Only the declarations that changed are replaced in the document
+            start, end, replacement = patch
+            cursor = QTextCursor(self.target_code.document())
+            cursor.setPosition(document_position(previous, start))
+            cursor.setPosition(document_position(previous, end),
+                               QTextCursor.MoveMode.KeepAnchor)
+            cursor.insertText(replacement)
+        except Exception as e:
+            self.live_converter = None
+            self.show_status(f"Live conversion error: {str(e)}", "red")
+    
+    def browse_output_path(self):
+        path = QFileDialog.getExistingDirectory(self, "Select Output Directory")
+        if path:
+            self.output_path.setText(path)
+    
+    def load_file(self):
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "Open Source File", "", 
+            "Source Files (*.c *.cpp *.cs *.h *.hpp);;All Files (*)"
+        )
+        
+        if file_path:
+            try:
+                # Large files are never loaded whole; convert streams them to disk instead
+                budget = self.get_memory_budget()
+                size = os.path.getsize(file_path)
+                if size > STREAM_THRESHOLD or (budget and not budget.fits_in_memory(size)):
+                    self.stream_source = file_path
+                    content = read_preview(file_path)
+                else:
+                    self.stream_source = None
+                    content = read_text(file_path)
+                
+                self.source_code.setPlainText(content)
+                self.source_code.setReadOnly(self.stream_source is not None)
+                
+                # Detected from the contents, since an extension like .h cannot tell C
+                # from C++; an Auto choice stays and is resolved at conversion time
+                detection = detect_file(file_path)
+                if detection.language and self.source_lang.currentText() != AUTO_DETECT:
+                    self.source_lang.setCurrentText(detection.language)
+                detected = ""
+                if detection.language:
+                    detected = (f" (detected {detection.language}, "
+                                f"{detection.confidence:.0%} confidence)")
+                
+                # Set default output name
+                base_name = os.path.splitext(os.path.basename(file_path))[0]
+                self.output_name.setText(f"{base_name}_converted")
+                
+                if self.stream_source:
+                    self.show_status(f"Loaded preview of large file: {file_path}{detected}",
+                                     "green")
+                else:
+                    self.show_status(f"Loaded: {file_path}{detected}", "green")
+            except Exception as e:
+                self.show_status(f"Error: {str(e)}", "red")
+    
+    def ask_output_file(self, title):
+        default_name = self.output_name.text() or "converted"
+        target_ext = self.get_extension(self.target_lang.currentText())
+        
+        default_path = self.output_path.text() or os.getcwd()
+        default_file = os.path.join(default_path, f"{default_name}{target_ext}")
+        
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, title, default_file,
+            f"Target Files (*{target_ext});;All Files (*)"
+        )
+        return file_path
+    
+    def save_file(self):
+        if not self.target_code.toPlainText():
+            self.show_status("No converted code to save", "orange")
+            return
+        
+        file_path = self.ask_output_file("Save Converted File")
+        
+        if file_path:
+            try:
+                # Written then renamed, so a failed save never truncates an existing file
+                if self.stream_output:
+                    # The editor only holds a preview of streamed output
+                    with open(self.stream_output, 'rb') as source, \
+                            atomic_output(file_path, 'wb') as target:
+                        shutil.copyfileobj(source, target)
+                else:
+                    write_text(file_path, self.target_code.toPlainText())
+                self.show_status(f"Saved: {file_path}", "green")
+            except Exception as e:
+                self.show_status(f"Error: {str(e)}", "red")
+    
+    def get_extension(self, language):
+        return get_extension(language)
+    
+    def clear_source(self):
+        self.stream_source = None
+        self.source_code.setReadOnly(False)
+        self.source_code.clear()
+    
+    def clear_target(self):
+        self.set_stream_output(None)
+        self.live_converter = None
+        self.target_code.clear()
+    
+    def get_options(self):
+        return {
+            "preserve_comments": self.preserve_comments.isChecked(),
+            "convert_oo": self.convert_oo.isChecked(),
+            "optimize_code": self.optimize_code.isChecked(),
+            "include_metadata": self.include_metadata.isChecked(),
+        }
+    
+    def get_memory_budget(self):
+        if not self.memory_usage.isChecked():
+            return None
+        return MemoryBudget(self.memory_limit.value() << 20)
+    
+    def get_profile_dir(self):
+        if not self.profile_jobs.isChecked():
+            return None
+        return os.path.join(self.output_path.text() or tempfile.gettempdir(), PROFILE_DIRNAME)
+    
+    def get_profile_file(self, name):
+        profile_dir = self.get_profile_dir()
+        if not profile_dir:
+            return None
+        return os.path.join(profile_dir, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.prof")
+    
+    def show_job_status(self, message):
+        # Completion message with where the time went, and the profile if one was taken
+        message = f"{message} ({self.job_timer.summary()})"
+        if self.job_profile:
+            message += f", profile: {self.job_profile}"
+        self.show_status(message, "green")
+    
+    def get_source_language(self, source=None):
+        # Resolves Auto from source, or from the large file being streamed without one;
+        # code without any evidence is treated as C
+        from_lang = self.source_lang.currentText()
+        if from_lang == AUTO_DETECT:
+            if source is None:
+                detection = detect_file(self.stream_source)
+            else:
+                detection = detect_language(source)
+            from_lang = detection.language or "C"
+        return from_lang
+    
+    def set_busy(self, busy):
+        self.convert_button.setEnabled(not busy)
+        self.convert_all_button.setEnabled(not busy)
+        self.cancel_button.setEnabled(busy)
+    
+    def convert_code(self):
+        if self.stream_source:
+            self.convert_stream()
+            return
+        
+        if self.worker is not None:
+            return
+        
+        timer = StageTimer()
+        with timer.stage("read"):
+            source = self.source_code.toPlainText()
+        from_lang = self.get_source_language(source)
+        to_lang = self.target_lang.currentText()
+        
+        if not source.strip():
+            self.show_status("Error: Source code is empty", "red")
+            return
+        
+        self.progress_bar.setValue(0)
+        self.show_status("Converting...", "blue")
+        self.set_busy(True)
+        self.target_code.clear()
+        self.rendered_length = 0
+        
+        # Widgets must not be touched off the GUI thread, so options are captured here.
+        # The worker fills in the timer; it is only read back once it has finished.
+        self.job_timer = timer
+        self.job_profile = self.get_profile_file("convert")
+        self.worker = ConversionWorker(source, from_lang, to_lang, self.get_options(),
+                                       self.cache, self.get_memory_budget(), self.job_timer,
+                                       self.job_profile)
+        self.worker.signals.progress.connect(self.progress_bar.setValue)
+        self.worker.signals.chunk.connect(self.append_target_chunk)
+        self.worker.signals.finished.connect(
+            lambda result: self.on_conversion_finished(result, from_lang, to_lang))
+        self.worker.signals.spilled.connect(
+            lambda path: self.on_stream_finished(path, from_lang, to_lang, spilled=True))
+        self.worker.signals.error.connect(self.on_conversion_error)
+        self.worker.signals.cancelled.connect(self.on_conversion_cancelled)
+        self.thread_pool.start(self.worker)
+    
+    def convert_stream(self):
+        if self.worker is not None:
+            return
+        
+        output_file = self.ask_output_file("Convert Large File To")
+        if not output_file:
+            return
+        
+        from_lang = self.get_source_language()
+        to_lang = self.target_lang.currentText()
+        
+        self.progress_bar.setValue(0)
+        self.show_status("Streaming conversion...", "blue")
+        self.set_busy(True)
+        
+        self.job_timer = StageTimer()
+        self.job_profile = self.get_profile_file("stream")
+        self.worker = StreamConversionWorker(self.stream_source, output_file, from_lang,
+                                             to_lang, self.get_options(), self.cache,
+                                             self.get_memory_budget(), self.job_timer,
+                                             self.job_profile)
+        self.worker.signals.progress.connect(self.progress_bar.setValue)
+        self.worker.signals.finished.connect(
+            lambda path: self.on_stream_finished(path, from_lang, to_lang))
+        self.worker.signals.error.connect(self.on_conversion_error)
+        self.worker.signals.cancelled.connect(self.on_conversion_cancelled)
+        self.thread_pool.start(self.worker)
+    
+    def on_stream_finished(self, output_file, from_lang, to_lang, spilled=False):
+        self.worker = None
+        self.set_busy(False)
+        self.progress_bar.setValue(100)
+        self.set_stream_output(output_file, spilled)
+        self.live_converter = None
+        with self.job_timer.stage("widget"):
+            self.target_code.setPlainText(read_preview(output_file))
+        self.show_job_status(f"Conversion complete: {from_lang} → {to_lang}, "
+                             f"saved to {output_file}")
+    
+    def set_stream_output(self, path, spilled=False):
+        # The file the target pane previews; a spill file it replaces is deleted
+        if self.spill_file and self.spill_file != path:
+            try:
+                os.remove(self.spill_file)
+            except OSError:
+                pass
+        self.spill_file = path if spilled else None
+        self.stream_output = path
+    
+    def cancel_conversion(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.cancel_button.setEnabled(False)
+            self.show_status("Cancelling...", "orange")
+    
+    def append_target_chunk(self, text):
+        with self.job_timer.stage("widget"):
+            cursor = QTextCursor(self.target_code.document())
+            cursor.movePosition(QTextCursor.MoveOperation.End)
+            cursor.insertText(text)
+        self.rendered_length += len(text)
+    
+    def on_conversion_finished(self, result, from_lang, to_lang):
+        self.worker = None
+        self.set_busy(False)
+        self.progress_bar.setValue(100)
+        self.set_stream_output(None)
+        self.live_converter = None
+        # Already on screen unless it came from the cache in one piece
+        if self.rendered_length != len(result):
+            with self.job_timer.stage("widget"):
+                self.target_code.setPlainText(result)
+        self.rendered_length = 0
+        self.show_job_status(f"Conversion complete: {from_lang} → {to_lang}")
+    
+    def discard_partial_output(self):
+        if self.rendered_length:
+            self.target_code.clear()
+            self.rendered_length = 0
+    
+    def on_conversion_error(self, message):
+        self.worker = None
+        self.set_busy(False)
+        self.discard_partial_output()
+        self.progress_bar.setValue(0)
+        self.show_status(f"Conversion error: {message}", "red")
+    
+    def on_conversion_cancelled(self):
+        self.worker = None
+        self.set_busy(False)
+        self.discard_partial_output()
+        self.progress_bar.setValue(0)
+        self.show_status("Conversion cancelled", "orange")
+    
+    def batch_convert(self):
+        if self.worker is not None:
+            return
+        
+        output_root = self.output_path.text()
+        if not output_root:
+            self.show_status("Error: Select an output directory first", "red")
+            return
+        
+        source_root = QFileDialog.getExistingDirectory(self, "Select Source Directory")
+        if not source_root:
+            return
+        
+        from_lang = self.source_lang.currentText()
+        to_lang = self.target_lang.currentText()
+        workers = get_worker_count(self.threading_combo.currentText())
+        
+        self.progress_bar.setValue(0)
+        self.show_status(f"Batch converting {source_root} with {workers} worker(s)...", "blue")
+        self.set_busy(True)
+        
+        budget = self.get_memory_budget()
+        self.worker = BatchWorker(source_root, output_root, from_lang, to_lang,
+                                  self.get_options(), workers,
+                                  self.cache.directory if self.cache else None,
+                                  budget.limit if budget else None,
+                                  os.path.join(output_root, TRACE_FILENAME),
+                                  self.get_profile_dir(), self.source_maps.isChecked(),
+                                  self.watch_source.isChecked(),
+                                  self.verify_outputs.isChecked())
+        self.worker.signals.progress.connect(self.progress_bar.setValue)
+        self.worker.signals.file_done.connect(self.on_batch_file_done)
+        self.worker.signals.finished.connect(self.on_batch_finished)
+        self.worker.signals.error.connect(self.on_conversion_error)
+        self.worker.signals.cancelled.connect(self.on_conversion_cancelled)
+        self.worker.signals.watching.connect(
+            lambda result: self.on_batch_watching(result, source_root))
+        self.worker.signals.updated.connect(self.on_watch_updated)
+        self.worker.signals.stopped.connect(self.on_watch_stopped)
+        self.thread_pool.start(self.worker)
+    
+    def on_batch_file_done(self, source_path, done, total):
+        self.status_bar.setText(f"[{done}/{total}] {os.path.basename(source_path)}")
+    
+    def on_batch_finished(self, result):
+        self.worker = None
+        self.set_busy(False)
+        self.progress_bar.setValue(100)
+        
+        message = self.batch_message(result)
+        if result.failed or result.verification and result.verification.failed:
+            self.show_status(message, "orange")
+        else:
+            self.show_status(message, "green")
+    
+    def on_batch_watching(self, result, source_root):
+        # The worker stays busy, Cancel stops watching
+        self.progress_bar.setValue(100)
+        message = self.batch_message(result)
+        self.show_status(f"{message}; watching {source_root} for changes...", "blue")
+    
+    def on_watch_updated(self, result):
+        message = (f"{time.strftime('%H:%M:%S')} reconverted {result.converted} file(s), "
+                   f"removed {result.removed} in {result.elapsed * 1000:.0f} ms")
+        self.status_bar.setToolTip(f"Summed over workers: {result.timer.summary()}")
+        if result.failed:
+            failed = ", ".join(os.path.basename(path) for path, _ in result.errors)
+            self.show_status(f"{message}, failed: {failed}", "orange")
+        else:
+            self.show_status(message, "green")
+    
+    def on_watch_stopped(self):
+        self.worker = None
+        self.set_busy(False)
+        self.show_status("Stopped watching", "orange")
+    
+    def batch_message(self, result):
+        message = (f"Batch complete: {result.converted} file(s), {result.lines} lines in "
+                   f"{result.elapsed:.2f}s ({result.lines_per_second:,.0f} lines/s), "
+                   f"{result.workers} worker(s), peak RSS {format_bytes(result.peak_rss)}, "
+                   f"trace: {TRACE_FILENAME}")
+        if result.languages:
+            message += ", detected " + ", ".join(f"{count} {language or 'unreadable'}"
+                                                 for language, count
+                                                 in result.languages.items())
+        if result.failed:
+            message += f", {result.failed} failed"
+        if result.verification:
+            message += (f", verified {result.verification.summary()}, report: "
+                        f"{VERIFY_REPORT_FILENAME}")
+        self.status_bar.setToolTip(f"Summed over workers: {result.timer.summary()}")
+        return message
+    
+    def closeEvent(self, event):
+        if self.worker is not None:
+            self.worker.cancel()
+        self.thread_pool.waitForDone()
+        self.set_stream_output(None)
+        super().closeEvent(event)
+    
+    def show_status(self, message, color="white"):
+        colors = {
+            "red": "#ff6b6b",
+            "green": "#6bff6b",
+            "blue": "#6b6bff",
+            "orange": "#ffb347",
+            "white": "#ffffff"
+        }
+        
+        self.status_bar.setText(message)
+        self.status_bar.setStyleSheet(f"color: {colors.get(color, '#ffffff')};")
+        
+        # Animate status change
+        self.status_anim.stop()
+        self.status_anim.setStartValue(f"color: {colors.get(color, '#ffffff')}; font-weight: bold;")
+        self.status_anim.setEndValue(f"color: {colors.get(color, '#ffffff')}; font-weight: normal;")
+        self.status_anim.start()
+
+def run_gui(argv):
+    app = QApplication(argv)
+    
+    # Set application attributes
+    app.setApplicationName("C-Convert-Hub")
+    app.setApplicationDisplayName("C-Convert-Hub")
+    app.setApplicationVersion("1.0.0")
+    
+    window = CodeConverterApp()
+    window.show()
+    return app.exec()